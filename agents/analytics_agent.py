@@ -0,0 +1,214 @@
+import io
+import re
+import csv
+import logging
+import numpy as np
+from utils import results_store
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+HISTOGRAM_BINS = 10          # score distribution in tenths of the max marks
+DISCRIMINATION_GROUP = 0.27  # upper/lower group size for the discrimination index
+OUTLIER_Z = 3.5              # robust (MAD) z-score threshold
+EXPORT_CHUNK_ROWS = 50000
+
+# Question labels are stored as integer codes, so labels of any length stay distinct
+ROW_DTYPE = np.dtype([("sheet", "i8"), ("question", "i8"), ("marks", "f8"), ("max", "f8")])
+
+def _natural_key(question):
+    # "2" < "10" < "10a"
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", question)]
+
+def load_scores(exam_id, db_path=None):
+    """
+    Loads an exam's stored grades into a dense student x question matrix.
+    Rows are read from the results store in batches straight into NumPy
+    arrays; multiple segments matched to the same question are summed.
+    Args:
+        exam_id (str): Exam to load.
+    Returns:
+        dict: "sheet_ids" (list), "questions" (ndarray[str]), "max_marks" (ndarray),
+              "scores" (ndarray, sheets x questions), "attempted" (bool ndarray).
+    """
+    db_path = db_path or results_store.RESULTS_DB
+    rowids, sheet_ids = results_store.load_sheet_ids(exam_id, db_path)
+    codes = {}  # question label -> code, in order of first appearance
+    batches = [np.fromiter(((sheet, codes.setdefault(str(question), len(codes)), marks, max_m)
+                            for sheet, question, marks, max_m in batch), dtype=ROW_DTYPE, count=len(batch))
+               for batch in results_store.iter_score_rows(exam_id, db_path)]
+    rows = np.concatenate(batches) if batches else np.empty(0, dtype=ROW_DTYPE)
+
+    # Relabel so columns come out in natural question order
+    labels = list(codes)
+    order = np.array(sorted(range(len(labels)), key=lambda i: _natural_key(labels[i])), dtype=np.int64)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    questions = np.array([labels[i] for i in order.tolist()], dtype=str)
+    q_idx = rank[rows["question"]]
+    s_idx = np.searchsorted(np.asarray(rowids, dtype=np.int64), rows["sheet"])
+    n_sheets, n_questions = len(sheet_ids), len(questions)
+
+    flat = s_idx * n_questions + q_idx
+    size = n_sheets * n_questions
+    scores = np.bincount(flat, weights=rows["marks"], minlength=size).reshape(n_sheets, n_questions)
+    attempted = (np.bincount(flat, minlength=size) > 0).reshape(n_sheets, n_questions)
+    max_marks = np.zeros(n_questions)
+    np.maximum.at(max_marks, q_idx, rows["max"])
+
+    return {
+        "sheet_ids": sheet_ids,
+        "questions": questions,
+        "max_marks": max_marks,
+        "scores": np.minimum(scores, max_marks),
+        "attempted": attempted,
+    }
+
+def _safe_div(a, b):
+    return np.divide(a, b, out=np.zeros(np.broadcast(a, b).shape), where=b != 0)
+
+def summarize_scores(data):
+    """
+    Computes class-level statistics from `load_scores` output, fully vectorised.
+    Returns:
+        dict: "students", "overall", per-question stats ("questions") and "outliers".
+    """
+    scores, max_marks = data["scores"], data["max_marks"]
+    n_sheets, n_questions = scores.shape
+    if n_sheets == 0 or n_questions == 0:
+        return {"students": n_sheets, "overall": {}, "questions": [], "outliers": []}
+
+    totals = scores.sum(axis=1)
+    total_max = max_marks.sum()
+
+    # Difficulty (p) and upper/lower-group discrimination index (D)
+    difficulty = _safe_div(scores.mean(axis=0), max_marks)
+    group = max(1, int(round(DISCRIMINATION_GROUP * n_sheets)))
+    order = np.argsort(totals, kind="stable")
+    upper, lower = scores[order[-group:]], scores[order[:group]]
+    discrimination = _safe_div(upper.mean(axis=0) - lower.mean(axis=0), max_marks)
+
+    # Corrected item-total correlation: each question against the rest of the paper
+    rest = totals[:, None] - scores
+    item_c = scores - scores.mean(axis=0)
+    rest_c = rest - rest.mean(axis=0)
+    item_total_r = _safe_div((item_c * rest_c).sum(axis=0),
+                             np.sqrt((item_c ** 2).sum(axis=0) * (rest_c ** 2).sum(axis=0)))
+
+    # Score distribution in tenths of the max marks, one histogram per question
+    fraction = _safe_div(scores, max_marks)
+    bins = np.minimum((fraction * HISTOGRAM_BINS).astype(np.int64), HISTOGRAM_BINS - 1)
+    histograms = np.bincount((bins + np.arange(n_questions) * HISTOGRAM_BINS).ravel(),
+                             minlength=n_questions * HISTOGRAM_BINS).reshape(n_questions, HISTOGRAM_BINS)
+
+    # Robust z-score of totals (median / MAD) for outlier sheets
+    median_total = np.median(totals)
+    mad = np.median(np.abs(totals - median_total))
+    if mad > 0:
+        z = 0.6745 * (totals - median_total) / mad
+    else:
+        std = totals.std()
+        z = (totals - totals.mean()) / std if std > 0 else np.zeros_like(totals)
+    outlier_idx = np.flatnonzero(np.abs(z) > OUTLIER_Z)
+
+    means = scores.mean(axis=0)
+    medians = np.median(scores, axis=0)
+    stds = scores.std(axis=0)
+    attempt_rate = data["attempted"].mean(axis=0)
+
+    questions = []
+    for i, question in enumerate(data["questions"].tolist()):
+        questions.append({
+            "question_number": question,
+            "max_marks": float(max_marks[i]),
+            "attempt_rate": round(float(attempt_rate[i]), 4),
+            "mean": round(float(means[i]), 4),
+            "median": float(medians[i]),
+            "std": round(float(stds[i]), 4),
+            "difficulty_index": round(float(difficulty[i]), 4),
+            "discrimination_index": round(float(discrimination[i]), 4),
+            "item_total_correlation": round(float(item_total_r[i]), 4),
+            "distribution": histograms[i].tolist(),
+            # Negative discrimination usually means a key or marking error
+            "needs_review": bool(discrimination[i] < 0),
+        })
+
+    return {
+        "students": n_sheets,
+        "overall": {
+            "total_possible_marks": float(total_max),
+            "mean": round(float(totals.mean()), 4),
+            "median": float(median_total),
+            "std": round(float(totals.std()), 4),
+            "mean_percentage": round(float(_safe_div(totals.mean(), total_max) * 100), 2),
+        },
+        "questions": questions,
+        "outliers": [{"sheet_id": data["sheet_ids"][i], "total": float(totals[i]),
+                      "robust_z": round(float(z[i]), 2)} for i in outlier_idx.tolist()],
+    }
+
+def compute_class_analytics(exam_id, db_path=None):
+    """
+    Class-level results for one exam: per-question mean/median/distribution,
+    difficulty and discrimination indices, and outlier sheets.
+    """
+    with span("analytics", exam_id=exam_id) as attrs:
+        data = load_scores(exam_id, db_path)
+        attrs.update(sheets=len(data["sheet_ids"]), questions=len(data["questions"]))
+        analytics = summarize_scores(data)
+    analytics["exam_id"] = exam_id
+    return analytics
+
+def _score_chunks(data, chunk_rows):
+    """Yields (sheet_ids, totals, scores) slices of at most `chunk_rows` sheets."""
+    scores = data["scores"]
+    totals = scores.sum(axis=1)
+    for start in range(0, scores.shape[0], chunk_rows):
+        stop = start + chunk_rows
+        yield data["sheet_ids"][start:stop], totals[start:stop], scores[start:stop]
+
+def iter_scores_csv(exam_id, db_path=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Streams per-sheet scores as CSV text chunks (header first):
+    sheet_id, total, then one column per question.
+    """
+    data = load_scores(exam_id, db_path)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["sheet_id", "total"] + [f"Q{q}" for q in data["questions"].tolist()])
+    for sheet_ids, totals, scores in _score_chunks(data, chunk_rows):
+        writer.writerows(zip(sheet_ids, totals.tolist(), *scores.T.tolist()))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def export_scores(exam_id, path, db_path=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Writes per-sheet scores to `path` in chunks. The format follows the
+    extension: ".parquet" (needs pyarrow) or CSV otherwise.
+    Returns:
+        str: The path written.
+    """
+    if not path.endswith(".parquet"):
+        with open(path, "w", newline="") as f:
+            for chunk in iter_scores_csv(exam_id, db_path, chunk_rows):
+                f.write(chunk)
+        return path
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow") from e
+
+    data = load_scores(exam_id, db_path)
+    columns = [f"Q{q}" for q in data["questions"].tolist()]
+    schema = pa.schema([("sheet_id", pa.string()), ("total", pa.float64())] +
+                       [(name, pa.float64()) for name in columns])
+    with pq.ParquetWriter(path, schema) as writer:
+        for sheet_ids, totals, scores in _score_chunks(data, chunk_rows):
+            arrays = [pa.array(sheet_ids, pa.string()), pa.array(totals)] + [pa.array(col) for col in scores.T]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+    return path
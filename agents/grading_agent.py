@@ -1,10 +1,31 @@
+import os
+import re
+import time
 import logging
-import json
-from utils.hf_client import query_hf_inference
+import threading
+from utils.hf_client import stream_json_object
+from utils.segmenter import QUESTION_MARKER, PAGE_HEADER
+from utils.units import find_quantities, quantities_equal
+from utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
-MODEL_URL = "https://router.huggingface.co/hf-inference/models/IQuest-Coder-V1-14B-Instruct"
+MODEL_URL = os.getenv("GRADING_MODEL_URL", "https://router.huggingface.co/hf-inference/models/IQuest-Coder-V1-14B-Instruct")
+SMALL_MODEL_URL = os.getenv("GRADING_SMALL_MODEL_URL", "https://router.huggingface.co/hf-inference/models/Qwen/Qwen2.5-3B-Instruct")
+
+# Tiers are tried in order; an answer moves up only when the tier below is unsure.
+# "local" = exact / unit-aware numeric check, no model call.
+CASCADE = [t.strip() for t in os.getenv("GRADING_CASCADE", "local,small,large").split(",") if t.strip()]
+TIER_URLS = {"small": SMALL_MODEL_URL, "large": MODEL_URL}
+CONFIDENCE_THRESHOLD = float(os.getenv("GRADING_CONFIDENCE_THRESHOLD", "0.8"))
+
+# Cost of one call, relative to one large-model call
+TIER_COSTS = {"local": 0.0, "small": float(os.getenv("GRADING_SMALL_COST", "0.15")), "large": 1.0}
+# Seed for the large-model latency estimate, refined from observed calls
+LARGE_LATENCY_ESTIMATE_S = float(os.getenv("GRADING_LARGE_LATENCY_S", "6.0"))
+
+_latency_lock = threading.Lock()
+_large_latency_s = LARGE_LATENCY_ESTIMATE_S
 
 SYSTEM_PROMPT = """You are a Grading Agent. Your goal is to evaluate a student's answer against a solution key.
 Input:
@@ -17,16 +38,93 @@ Rules:
 - Partial credit is allowed if the method is correct but minor arithmetic errors exist.
 - Penalize for wrong formulas, missing units, or incorrect final answers.
 - DO NOT hallucinate. Grade only what is visible in the Student Answer.
-- Output purely in JSON format with keys: "marks_awarded" (float), "feedback" (string).
+- Output purely in JSON format with keys: "marks_awarded" (float), "feedback" (string), "confidence" (float 0-1, how sure you are of the marks).
 - Do not add any markdown formatting or explanation. Just the JSON.
 
 Example Output:
-{"marks_awarded": 4.5, "feedback": "Correct formula and substitution. Minor calculation error in final step."}
+{"marks_awarded": 4.5, "feedback": "Correct formula and substitution. Minor calculation error in final step.", "confidence": 0.9}
 """
 
-def grade_answer(student_answer, solution_text, max_marks):
+ANSWER_PREFIX = re.compile(r"^\s*(?:ans(?:wer)?\s*[:.\-]?|=)\s*", re.IGNORECASE)
+
+def _normalize(text):
+    return " ".join(text.lower().split()).rstrip(".")
+
+def _clean_answer(text):
+    """
+    Strips page headers, the leading question marker and an "Ans:" prefix.
+    """
+    text = PAGE_HEADER.sub("", text).strip()
+    text = QUESTION_MARKER.sub("", text, count=1)
+    text = text.lstrip(" \t.):")
+    return ANSWER_PREFIX.sub("", text).strip()
+
+def _grade_locally(student_answer, solution_text, max_marks):
+    """
+    Grades trivial one-line answers without a model call.
+    Exact matches and unit-aware numeric matches get full marks; a lone wrong
+    value gets zero. Answers or solutions holding more than one quantity, and
+    anything else unclear, return None so the next tier decides.
+    """
+    answer = _clean_answer(student_answer)
+    solution = _clean_answer(str(solution_text))
+    if not answer or "\n" in answer or len(answer) > 80:
+        return None
+    if len(solution) > 200 or len(solution.splitlines()) > 3:
+        return None
+
+    if _normalize(answer) == _normalize(solution):
+        return {"marks_awarded": float(max_marks), "feedback": "Answer matches the solution key exactly.", "confidence": 1.0}
+
+    # One value on each side, or a model decides (partial credit, multi-part keys)
+    expected = find_quantities(solution)
+    given = find_quantities(answer)
+    if len(expected) != 1 or len(given) != 1:
+        return None
+    expected, given = expected[0], given[0]
+    if expected["unit"] and not given["unit"]:
+        # Missing units: let a model decide on partial credit
+        return None
+
+    same = quantities_equal(given, expected)
+    if same is None:
+        return None
+    stated = f"{given['value']:g} {given['unit']}".strip()
+    wanted = f"{expected['value']:g} {expected['unit']}".strip()
+    if same:
+        return {"marks_awarded": float(max_marks), "feedback": f"Final answer {stated} matches the expected {wanted}.", "confidence": 1.0}
+    return {"marks_awarded": 0.0, "feedback": f"Final answer {stated} does not match the expected {wanted}.", "confidence": 1.0}
+
+def _validate(result, max_marks):
+    """
+    Normalises a model's grading JSON.
+    Raises:
+        ValueError: If marks are missing, non-numeric or out of range.
+    """
+    marks = float(result["marks_awarded"])
+    if not 0 <= marks <= float(max_marks):
+        raise ValueError(f"marks_awarded {marks} outside 0-{max_marks}")
+    try:
+        confidence = float(result.get("confidence"))
+    except (TypeError, ValueError):
+        confidence = 0.0
+    return {"marks_awarded": marks, "feedback": str(result.get("feedback", "")), "confidence": confidence}
+
+def large_latency_estimate():
+    """Current estimate (seconds) of one large-model grading call."""
+    with _latency_lock:
+        return _large_latency_s
+
+def _observe_large_latency(seconds):
+    global _large_latency_s
+    with _latency_lock:
+        _large_latency_s = 0.8 * _large_latency_s + 0.2 * seconds
+
+def _grade_with_model(model_url, student_answer, solution_text, max_marks):
     """
-    Grades the student answer against the solution.
+    Grades the student answer with one model tier.
+    Raises:
+        ValueError: If the model does not return valid grading JSON.
     """
     user_message = f"""
     Max Marks: {max_marks}
@@ -48,28 +146,87 @@ def grade_answer(student_answer, solution_text, max_marks):
         "max_tokens": 512,
         "temperature": 0.2
     }
-    
-    try:
-        logger.info("Calling Grading Agent...")
-        result = query_hf_inference(payload, MODEL_URL)
-        
-        content = ""
-        if isinstance(result, list) and 'generated_text' in result[0]:
-             content = result[0]['generated_text']
-        elif 'choices' in result:
-             content = result['choices'][0]['message']['content']
-        else:
-             content = str(result)
-        
-        # Clean up code blocks if present
-        content = content.strip()
-        if content.startswith("```json"):
-            content = content[7:]
-        if content.endswith("```"):
-            content = content[:-3]
-            
-        return json.loads(content.strip())
-
-    except Exception as e:
-        logger.error(f"Grading Agent failed: {e}")
-        return {"marks_awarded": 0, "feedback": "Error during grading."}
+
+    # Stream the completion and stop as soon as the JSON object is closed
+    return _validate(stream_json_object(payload, model_url), max_marks)
+
+def grade_answer(student_answer, solution_text, max_marks, from_key=False):
+    """
+    Grades the student answer against the solution, walking the model cascade.
+    Args:
+        from_key (bool): The solution is this question's own entry from a JSON key.
+                         The local tier only runs then; a whole plain-text key
+                         holds other questions' values too.
+    Returns:
+        dict: "marks_awarded", "feedback", plus "grading_tier" (tier that decided),
+              "grading_latency_s", and "latency_saved_s" / "cost_saved" relative to
+              sending the answer straight to the large model. "low_confidence" is
+              set when a higher tier failed and an escalated lower-tier grade was kept.
+    """
+    with span("grade", max_marks=max_marks, answer_chars=len(student_answer)) as attrs:
+        result = _grade_cascade(student_answer, solution_text, max_marks, from_key)
+        attrs.update(tier=result["grading_tier"], marks_awarded=result.get("marks_awarded"))
+        return result
+
+def _grade_cascade(student_answer, solution_text, max_marks, from_key=False):
+    started = time.monotonic()
+    spent_cost = 0.0
+    result = None
+    tier = None
+    # Last valid grade that was escalated for low confidence, and its tier
+    fallback = fallback_tier = None
+
+    for position, tier in enumerate(CASCADE):
+        is_last = position == len(CASCADE) - 1
+        if tier == "local":
+            if not from_key:
+                continue
+            with span("grade.tier", tier=tier) as attrs:
+                result = _grade_locally(student_answer, solution_text, max_marks)
+                attrs["decided"] = result is not None
+            if result is not None:
+                break
+            continue
+
+        spent_cost += TIER_COSTS.get(tier, 1.0)
+        tier_started = time.monotonic()
+        try:
+            logger.info(f"Calling Grading Agent ({tier} tier)...")
+            with span("grade.tier", tier=tier, model_url=TIER_URLS[tier]) as attrs:
+                result = _grade_with_model(TIER_URLS[tier], student_answer, solution_text, max_marks)
+                attrs["confidence"] = result["confidence"]
+        except Exception as e:
+            logger.warning(f"Grading tier '{tier}' failed: {e}")
+            result = None
+            continue
+        if tier == "large":
+            _observe_large_latency(time.monotonic() - tier_started)
+        if is_last or result["confidence"] >= CONFIDENCE_THRESHOLD:
+            break
+        logger.info(f"Tier '{tier}' confidence {result['confidence']:.2f} below {CONFIDENCE_THRESHOLD}, escalating.")
+        fallback, fallback_tier = result, tier
+        result = None
+
+    elapsed = time.monotonic() - started
+    if result is None and fallback is not None:
+        logger.warning(f"Higher tiers failed; keeping the low-confidence '{fallback_tier}' grade.")
+        result, tier = fallback, fallback_tier
+        result["low_confidence"] = True
+    elif result is None:
+        logger.error("Grading Agent failed on every tier.")
+        result = {"marks_awarded": 0, "feedback": "Error during grading."}
+        tier = None
+
+    if tier == "large" or result.get("low_confidence"):
+        # Escalated all the way: whatever the lower tiers spent is overhead
+        latency_saved = -(tier_started - started)
+    else:
+        latency_saved = large_latency_estimate() - elapsed
+
+    result.update({
+        "grading_tier": tier,
+        "grading_latency_s": round(elapsed, 3),
+        "latency_saved_s": round(latency_saved, 3) + 0.0,
+        "cost_saved": round(TIER_COSTS["large"] - spent_cost, 3),
+    })
+    return result
@@ -1,6 +1,6 @@
 import logging
-import json
-from utils.hf_client import query_hf_inference
+from utils.hf_client import stream_json_object
+from utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -24,9 +24,12 @@ OR
 {"question_number": "UNIDENTIFIED", "question_text": ""}
 """
 
-def match_answer_to_question(student_text, question_paper_text):
+def match_answer_to_question(student_text, question_paper_text, raise_on_error=False):
     """
     Identifies the question corresponding to the student's answer text.
+    Args:
+        raise_on_error (bool): Re-raise a failed model call instead of returning
+                               UNIDENTIFIED, so callers that cache results can retry.
     """
     user_message = f"""
     Question Paper:
@@ -49,25 +52,15 @@ def match_answer_to_question(student_text, question_paper_text):
     
     try:
         logger.info("Calling Matcher Agent...")
-        result = query_hf_inference(payload, MODEL_URL)
-        
-        content = ""
-        if isinstance(result, list) and 'generated_text' in result[0]:
-             content = result[0]['generated_text']
-        elif 'choices' in result:
-             content = result['choices'][0]['message']['content']
-        else:
-             content = str(result)
-        
-        # Clean up code blocks if present (some models insist on markdown)
-        content = content.strip()
-        if content.startswith("```json"):
-            content = content[7:]
-        if content.endswith("```"):
-            content = content[:-3]
-        
-        return json.loads(content.strip())
+        with span("match", model_url=MODEL_URL, answer_chars=len(student_text),
+                  question_paper_chars=len(question_paper_text)) as attrs:
+            # Stream the completion and stop as soon as the JSON object is closed
+            result = stream_json_object(payload, MODEL_URL)
+            attrs["question_number"] = result.get("question_number")
+            return result
 
     except Exception as e:
         logger.error(f"Matcher Agent failed: {e}")
+        if raise_on_error:
+            raise
         return {"question_number": "UNIDENTIFIED", "question_text": ""}
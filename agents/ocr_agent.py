@@ -1,8 +1,9 @@
 import logging
 import base64
-import requests
 from io import BytesIO
-from utils.hf_client import query_hf_inference
+from utils.hf_client import query_hf_inference, extract_content
+from utils.fetch import fetch_url
+from utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -12,20 +13,35 @@ BACKUP_MODEL_URL = "https://router.huggingface.co/hf-inference/models/OpenGVLab/
 
 SYSTEM_PROMPT = "Extract all visible handwritten text and equations exactly as written. Do not solve or explain."
 
+def _b64_file(path, chunk_size=3 * 256 * 1024):
+    """
+    Base64-encodes a file read in chunks. The encoded string (about 4/3 of the
+    file) is still built whole, since it goes into the JSON payload; the chunks
+    only avoid a second full-size copy of the raw bytes. Chunk size is a
+    multiple of 3 so the pieces concatenate without padding.
+    """
+    parts = []
+    with open(path, "rb") as image_file:
+        for chunk in iter(lambda: image_file.read(chunk_size), b""):
+            parts.append(base64.b64encode(chunk).decode('ascii'))
+    return "".join(parts)
+
 def _encode_image(image_path_or_url):
     """
-    Encodes an image to base64. Supports local paths and URLs.
+    Encodes an image to base64. Supports local paths, URLs, raw bytes and
+    in-memory PIL images (rendered pages never touch the disk).
+    URLs go through the bounded, cached fetcher in `utils.fetch`.
     """
     try:
+        if isinstance(image_path_or_url, (bytes, bytearray)):
+            return base64.b64encode(image_path_or_url).decode('ascii')
+        if hasattr(image_path_or_url, "save"):
+            buffer = BytesIO()
+            image_path_or_url.convert("RGB").save(buffer, format="JPEG")
+            return base64.b64encode(buffer.getbuffer()).decode('ascii')
         if image_path_or_url.startswith("http"):
-            response = requests.get(image_path_or_url)
-            response.raise_for_status()
-            image_data = response.content
-        else:
-            with open(image_path_or_url, "rb") as image_file:
-                image_data = image_file.read()
-        
-        return base64.b64encode(image_data).decode('utf-8')
+            return _b64_file(fetch_url(image_path_or_url))
+        return _b64_file(image_path_or_url)
     except Exception as e:
         logger.error(f"Failed to encode image: {e}")
         raise
@@ -33,8 +49,11 @@ def _encode_image(image_path_or_url):
 def extract_text(image_path):
     """
     Extracts text from an image using Primary OCR model, falling back to Backup if it fails.
+    `image_path` may also be raw image bytes or a PIL Image.
     """
-    base64_image = _encode_image(image_path)
+    with span("preprocess", source=image_path if isinstance(image_path, str) else type(image_path).__name__) as attrs:
+        base64_image = _encode_image(image_path)
+        attrs["base64_bytes"] = len(base64_image)
     
     # Payload structure for VL models often involves specific prompting or image inputs
     # Adjusting payload for Qwen2.5-VL / InternVL2 standards on HF Inference API
@@ -66,7 +85,9 @@ def extract_text(image_path):
 
     try:
         logger.info(f"Attempting OCR with Primary Model: {PRIMARY_MODEL_URL}")
-        result = query_hf_inference(payload, PRIMARY_MODEL_URL)
+        with span("ocr.attempt", model="primary", model_url=PRIMARY_MODEL_URL) as attrs:
+            result = query_hf_inference(payload, PRIMARY_MODEL_URL)
+            attrs["text_chars"] = len(extract_content(result))
         # Hugging Face Chat API usually returns: 
         # {'choices': [{'message': {'content': '...'}}]} or similar
         # But raw inference API for some VL models might differ. 
@@ -74,26 +95,17 @@ def extract_text(image_path):
         # Let's handle the list return which is common for HF inference (generated_text)
         # if it returns a list of dicts, or the choices format.
         
-        if isinstance(result, list) and 'generated_text' in result[0]:
-             return result[0]['generated_text']
-        elif 'choices' in result:
-             return result['choices'][0]['message']['content']
-        else:
-             # Fallback parsing
-             return str(result)
+        return extract_content(result)
              
     except Exception as e:
         logger.warning(f"Primary OCR failed: {e}. Switching to Backup Model.")
         try:
              # InternVL2 uses similar structure usually, but let's retry
-             result = query_hf_inference(payload, BACKUP_MODEL_URL)
+             with span("ocr.attempt", model="backup", model_url=BACKUP_MODEL_URL) as attrs:
+                 result = query_hf_inference(payload, BACKUP_MODEL_URL)
+                 attrs["text_chars"] = len(extract_content(result))
              
-             if isinstance(result, list) and 'generated_text' in result[0]:
-                 return result[0]['generated_text']
-             elif 'choices' in result:
-                 return result['choices'][0]['message']['content']
-             else:
-                 return str(result)
+             return extract_content(result)
         except Exception as e2:
              logger.error(f"Backup OCR also failed: {e2}")
              return "ILLEGIBLE"
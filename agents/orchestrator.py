@@ -0,0 +1,224 @@
+import json
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.ocr_agent import extract_text
+from agents.matcher_agent import match_answer_to_question
+from agents.grading_agent import grade_answer
+from agents.report_agent import generate_report
+from utils.segmenter import segment_answers
+from utils import results_store
+from utils.tracing import span, bind
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = 4
+REGRADE_WORKERS = 8
+_DONE = object()
+
+def lookup_solution(solution_key_text, question_id, default_marks=10):
+    """
+    Finds the solution text and marks for one question.
+    Args:
+        solution_key_text (str): JSON ({"1a": {"text": "...", "marks": 5}, ...}) or plain text.
+        question_id (str): Matched question number.
+    Returns:
+        tuple: (solution_text, max_marks, from_key). Plain-text keys are returned
+               whole, with from_key False: the text holds every question's solution.
+    """
+    try:
+        sol_json = json.loads(solution_key_text)
+    except (TypeError, ValueError):
+        return solution_key_text, default_marks, False
+
+    if isinstance(sol_json, dict):
+        entry = sol_json.get(str(question_id), sol_json.get(question_id))
+        if isinstance(entry, dict):
+            marks = entry.get("marks", default_marks)
+            if "text" in entry:
+                return entry["text"], marks, True
+            return solution_key_text, marks, False
+    return solution_key_text, default_marks, False
+
+def iter_page_texts(pages, on_page=None):
+    """
+    Runs OCR over the pages on a background thread and yields each transcript
+    as soon as it is ready, in page order. Illegible pages are skipped.
+    Args:
+        pages (iterable): Images accepted by `extract_text` (paths, URLs, bytes, PIL). May be lazy.
+        on_page (callable, optional): Called as on_page(page_number, text) per legible page.
+    Yields:
+        str: "--- Page N ---" headed transcript.
+    """
+    texts = queue.Queue()
+
+    def produce():
+        try:
+            for idx, page in enumerate(pages):
+                with span("ocr.page", page=idx + 1) as attrs:
+                    page_text = extract_text(page)
+                    attrs["text_chars"] = len(page_text)
+                if page_text != "ILLEGIBLE":
+                    if on_page:
+                        on_page(idx + 1, page_text)
+                    texts.put(f"\n--- Page {idx+1} ---\n{page_text}")
+                else:
+                    logger.warning(f"Page {idx+1} was illegible.")
+        except Exception as e:
+            texts.put(e)
+        finally:
+            texts.put(_DONE)
+
+    threading.Thread(target=bind(produce), name="ocr-producer", daemon=True).start()
+    while True:
+        item = texts.get()
+        if item is _DONE:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+def match_and_grade(student_text, question_paper_text, solution_key_text):
+    """
+    Matches one answer segment to its question and grades it.
+    Returns:
+        dict: Graded item in the shape `generate_report` expects.
+    """
+    with span("segment", answer_chars=len(student_text)):
+        return _match_and_grade(student_text, question_paper_text, solution_key_text)
+
+def _match_and_grade(student_text, question_paper_text, solution_key_text):
+    match_result = match_answer_to_question(student_text, question_paper_text)
+    question_id = match_result.get("question_number")
+
+    if question_id == "UNIDENTIFIED":
+        return {
+            "question_number": "UNIDENTIFIED",
+            "question_text": "",
+            "student_answer": student_text,
+            "marks_awarded": 0,
+            "max_marks": 0,
+            "feedback": "Could not match to any question in the paper."
+        }
+
+    logger.info(f"Matched to Question: {question_id}")
+    solution_text, max_marks, from_key = lookup_solution(solution_key_text, question_id)
+    grading_result = grade_answer(student_text, solution_text, max_marks, from_key=from_key)
+
+    return {
+        "question_number": question_id,
+        "question_text": match_result.get("question_text"),
+        "student_answer": student_text,
+        "marks_awarded": grading_result.get("marks_awarded", 0),
+        "max_marks": max_marks,
+        "solution_text": solution_text,
+        "feedback": grading_result.get("feedback", ""),
+        "grading_tier": grading_result.get("grading_tier"),
+        "low_confidence": grading_result.get("low_confidence", False),
+        "latency_saved_s": grading_result.get("latency_saved_s", 0),
+        "cost_saved": grading_result.get("cost_saved", 0)
+    }
+
+def evaluate_pages(pages, question_paper_text, solution_key_text, max_workers=MAX_WORKERS, on_page=None):
+    """
+    Pipelined evaluation: OCR -> segmentation -> match & grade.
+    Each answer segment is matched and graded as soon as it is complete,
+    while the remaining pages are still going through OCR.
+    Args:
+        pages (iterable): Images accepted by `extract_text`, one per page.
+        on_page (callable, optional): See `iter_page_texts`.
+    Yields:
+        dict: Graded items in completion order, each tagged with "segment_index".
+    """
+    results = queue.Queue()
+
+    def drive(pool):
+        count = 0
+        try:
+            for count, segment in enumerate(segment_answers(iter_page_texts(pages, on_page)), start=1):
+                future = pool.submit(bind(match_and_grade), segment, question_paper_text, solution_key_text)
+                future.add_done_callback(lambda f, i=count - 1: results.put((i, f)))
+        except Exception as e:
+            results.put(e)
+        finally:
+            results.put((_DONE, count))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        threading.Thread(target=bind(drive), args=(pool,), name="segment-driver", daemon=True).start()
+        expected = None
+        received = 0
+        while expected is None or received < expected:
+            item = results.get()
+            if isinstance(item, Exception):
+                raise item
+            index, value = item
+            if index is _DONE:
+                expected = value
+                continue
+            received += 1
+            graded = value.result()
+            graded["segment_index"] = index
+            yield graded
+
+def evaluate_sheet(pages, question_paper_text, solution_key_text, max_workers=MAX_WORKERS, on_page=None):
+    """
+    Runs `evaluate_pages` to completion.
+    Returns:
+        list[dict]: Graded items in answer-sheet order.
+    """
+    items = list(evaluate_pages(pages, question_paper_text, solution_key_text, max_workers, on_page))
+    items.sort(key=lambda item: item.pop("segment_index"))
+    return items
+
+def _regrade_one(answer, solution_text, max_marks, from_key):
+    grading_result = grade_answer(answer["student_answer"], solution_text, max_marks, from_key=from_key)
+    return {
+        "sheet_id": answer["sheet_id"],
+        "segment_index": answer["segment_index"],
+        "solution_text": solution_text,
+        "max_marks": max_marks,
+        "marks_awarded": grading_result.get("marks_awarded", 0),
+        "feedback": grading_result.get("feedback", ""),
+        "grading_tier": grading_result.get("grading_tier"),
+        "low_confidence": grading_result.get("low_confidence", False),
+        "latency_saved_s": grading_result.get("latency_saved_s", 0),
+        "cost_saved": grading_result.get("cost_saved", 0),
+    }
+
+def regrade_exam(exam_id, solution_key_text, max_workers=REGRADE_WORKERS, db_path=None, tenant=None):
+    """
+    Re-grades stored answers after a solution key change, without OCR or matching.
+    Only answers whose question's solution text or marks differ from the ones
+    they were graded with are sent back to the grading agent.
+    Args:
+        exam_id (str): Exam whose sheets should be updated.
+        solution_key_text (str): The corrected solution key.
+        tenant (str): Only regrade sheets this tenant stored (None: every sheet).
+    Returns:
+        dict: "answers_regraded", "questions_changed" and rebuilt "reports" per affected sheet.
+    """
+    db_path = db_path or results_store.RESULTS_DB
+    stale = []
+    for answer in results_store.load_answers(exam_id, db_path, tenant):
+        if answer["question_number"] == "UNIDENTIFIED":
+            continue
+        solution_text, max_marks, from_key = lookup_solution(solution_key_text, answer["question_number"])
+        if solution_text != answer["solution_text"] or float(max_marks) != answer["max_marks"]:
+            stale.append((answer, solution_text, max_marks, from_key))
+
+    logger.info(f"Regrading {len(stale)} answer(s) for exam {exam_id}")
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(bind(_regrade_one), *args) for args in stale]
+        updates = [future.result() for future in futures]
+    results_store.update_grades(updates, db_path)
+
+    affected = sorted({update["sheet_id"] for update in updates})
+    return {
+        "exam_id": exam_id,
+        "answers_regraded": len(updates),
+        "questions_changed": sorted({str(answer["question_number"]) for answer, *_ in stale}),
+        "reports": {sheet_id: generate_report(results_store.load_graded_items(sheet_id, db_path))
+                    for sheet_id in affected},
+    }
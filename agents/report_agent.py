@@ -1,5 +1,5 @@
-import json
 import logging
+from utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -15,14 +15,23 @@ def generate_report(graded_answers):
             - marks_awarded
             - max_marks
             - feedback
+            - grading_tier, low_confidence, latency_saved_s, cost_saved (optional, from the grading cascade)
             
     Returns:
         dict: Final evaluation report with total marks.
     """
+    with span("report", items=len(graded_answers)):
+        return _build_report(graded_answers)
+
+def _build_report(graded_answers):
     total_marks_awarded = 0
     total_max_marks = 0
     
     detailed_results = []
+    tier_counts = {}
+    low_confidence = 0
+    latency_saved = 0.0
+    cost_saved = 0.0
     
     for item in graded_answers:
         marks = item.get("marks_awarded", 0)
@@ -37,6 +46,14 @@ def generate_report(graded_answers):
         
         total_marks_awarded += marks
         total_max_marks += max_m
+
+        tier = item.get("grading_tier")
+        if tier:
+            tier_counts[tier] = tier_counts.get(tier, 0) + 1
+            latency_saved += item.get("latency_saved_s", 0) or 0
+            cost_saved += item.get("cost_saved", 0) or 0
+        if item.get("low_confidence"):
+            low_confidence += 1
         
         detailed_results.append({
             "question_number": item.get("question_number", "UNKNOWN"),
@@ -44,14 +61,23 @@ def generate_report(graded_answers):
             "student_response": item.get("student_answer", ""),
             "marks_awarded": marks,
             "max_marks": max_m,
-            "feedback": item.get("feedback", "")
+            "feedback": item.get("feedback", ""),
+            "grading_tier": tier,
+            # Kept from a lower tier after the higher one failed: worth a manual check
+            "low_confidence": bool(item.get("low_confidence"))
         })
         
     report = {
         "summary": {
             "total_marks_obtained": total_marks_awarded,
             "total_possible_marks": total_max_marks,
-            "percentage": (total_marks_awarded / total_max_marks * 100) if total_max_marks > 0 else 0
+            "percentage": (total_marks_awarded / total_max_marks * 100) if total_max_marks > 0 else 0,
+            "grading": {
+                "answers_per_tier": tier_counts,
+                "low_confidence_answers": low_confidence,
+                "latency_saved_s": round(latency_saved, 3),
+                "cost_saved": round(cost_saved, 3)
+            }
         },
         "details": detailed_results
     }
@@ -1,26 +1,38 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.formparsers import MultiPartParser
 from pydantic import BaseModel
-import shutil
 import os
-import json
 import logging
-import tempfile
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from typing import Optional
 
-# Import Agents and Utils
-from agents.ocr_agent import extract_text
-from agents.matcher_agent import match_answer_to_question
-from agents.grading_agent import grade_answer
-from agents.report_agent import generate_report
-from utils.pdf_utils import extract_pdf_text, pdf_to_images
-from PIL import Image
+from utils.env import load_env
+
+load_env()
+
+# Agents, PyMuPDF, PIL and NumPy are imported inside the endpoints that use
+# them, so the server starts (and answers /health) without loading them.
+from utils import results_store
+from utils.tracing import start_trace, span, bind
+from utils.scheduler import scheduler, priority, INTERACTIVE, BATCH, PRIORITY_CLASSES
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="MCP Answer Evaluator API")
+@asynccontextmanager
+async def lifespan(app):
+    # Start loading cold models before the first sheet arrives
+    from utils.warmup import start_background_warming
+    stop_keep_warm = start_background_warming()
+    yield
+    if stop_keep_warm:
+        stop_keep_warm.set()
+
+app = FastAPI(title="MCP Answer Evaluator API", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -31,108 +43,239 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Uploads stay in memory up to UPLOAD_SPOOL_BYTES, then spill to an anonymous temp file
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(8 * 1024 * 1024)))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+# Whole request body: up to three files at their limit, plus the form fields
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(3 * UPLOAD_MAX_BYTES + 1024 * 1024)))
+
+# Starlette spools each uploaded file while parsing the form; the endpoints use that file as is
+MultiPartParser.spool_max_size = UPLOAD_SPOOL_BYTES
+
+def _too_large(limit):
+    return JSONResponse({"detail": f"Request body exceeds the {limit} byte upload limit"}, status_code=413)
+
+class BodySizeLimit:
+    """
+    Rejects request bodies over UPLOAD_MAX_REQUEST_BYTES with 413 before the form
+    is parsed: up front from Content-Length, or as soon as a body sent without
+    one passes the limit, so nothing past it is read or spooled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        limit = UPLOAD_MAX_REQUEST_BYTES
+        declared = dict(scope["headers"]).get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > limit:
+            return await _too_large(limit)(scope, receive, send)
+
+        received = 0
+        exceeded = started = False
+
+        async def capped_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # The app sees the client go away; its response is replaced below
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if not exceeded or started:
+                started = started or message["type"] == "http.response.start"
+                await send(message)
+
+        try:
+            await self.app(scope, capped_receive, guarded_send)
+        except Exception:
+            if not exceeded or started:
+                raise
+        if exceeded and not started:
+            await _too_large(limit)(scope, receive, send)
+
+def _upload_file(upload):
+    """
+    The upload's spooled file, rewound; Starlette closes it after the response.
+    Raises 413 over UPLOAD_MAX_BYTES.
+    """
+    if upload.size is not None and upload.size > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"{upload.filename} exceeds the {UPLOAD_MAX_BYTES} byte upload limit")
+    with span("upload", filename=upload.filename, content_type=upload.content_type) as attrs:
+        attrs.update(bytes=upload.size, spilled_to_disk=(upload.size or 0) > UPLOAD_SPOOL_BYTES)
+    upload.file.seek(0)
+    return upload.file
+
+app.add_middleware(BodySizeLimit)
+
+def _tenant(request, tenant_header):
+    """Tenant for fair sharing: the X-Tenant-ID header, else the client address."""
+    return tenant_header or (request.client.host if request.client else "default")
+
+def _priority_class(priority_header):
+    """Priority class from the X-Priority header (default interactive); 400 on unknown values."""
+    priority_class = (priority_header or INTERACTIVE).strip().lower()
+    if priority_class not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail=f"X-Priority must be one of: {', '.join(PRIORITY_CLASSES)}")
+    return priority_class
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/api/scheduler/stats")
+def scheduler_stats():
+    """Inference queue depth, calls in flight and queue wait times per priority class."""
+    return scheduler.stats()
+
 class EvaluationRequest(BaseModel):
     question_paper_text: str
     solution_key_text: str
 
 @app.post("/api/evaluate")
 async def evaluate(
+    request: Request,
     answer_sheet: UploadFile = File(...),
     question_paper: Optional[UploadFile] = File(None),
     solution_key: Optional[UploadFile] = File(None),
     question_paper_text: Optional[str] = Form(None),
-    solution_key_text: Optional[str] = Form(None)
+    solution_key_text: Optional[str] = Form(None),
+    exam_id: Optional[str] = Form(None),
+    tenant: Optional[str] = Header(None, alias="X-Tenant-ID"),
+    priority_header: Optional[str] = Header(None, alias="X-Priority")
 ):
-    try:
-        # 1. Process Answer Sheet
-        suffix = os.path.splitext(answer_sheet.filename)[1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            shutil.copyfileobj(answer_sheet.file, tmp)
-            answer_sheet_path = tmp.name
-
-        answer_sheet_images = []
-        if answer_sheet_path.endswith(".pdf"):
-            answer_sheet_images = pdf_to_images(answer_sheet_path)
-        else:
-            answer_sheet_images = [Image.open(answer_sheet_path)]
-
-        # 2. Process QP Text
-        final_qp_text = question_paper_text or ""
-        if question_paper:
-             with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_qp:
-                shutil.copyfileobj(question_paper.file, tmp_qp)
-                final_qp_text = extract_pdf_text(tmp_qp.name)
-        
-        if not final_qp_text:
-            raise HTTPException(status_code=400, detail="Question Paper text or file is required")
-
-        # 3. Process Solution Key
-        final_sol_text = solution_key_text or ""
-        if solution_key:
-             with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_sol:
-                shutil.copyfileobj(solution_key.file, tmp_sol)
-                final_sol_text = extract_pdf_text(tmp_sol.name)
-        
-        if not final_sol_text:
-             raise HTTPException(status_code=400, detail="Solution Key text or file is required")
-
-        # --- ORCHESTRATION ---
-        
-        # Step 1: OCR
-        full_student_text = ""
-        for idx, img in enumerate(answer_sheet_images):
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp_img:
-                img.save(tmp_img.name)
-                page_text = extract_text(tmp_img.name)
-                if page_text != "ILLEGIBLE":
-                    full_student_text += f"\n--- Page {idx+1} ---\n{page_text}"
-        
-        if not full_student_text.strip():
-             return {"error": "OCR failed to extract text or sheet was illegible."}
-
-        # Step 2: Match
-        match_result = match_answer_to_question(full_student_text, final_qp_text)
-        
-        # Step 3: Grade
-        grading_result = {}
-        if match_result.get("question_number") != "UNIDENTIFIED":
-            # Parse Solution Key logic (simplified from app.py)
-            q_id = match_result.get("question_number")
-            max_marks = 10
-            sol_text_q = final_sol_text
-            
+    """
+    Evaluates one answer sheet. Bulk runs should send `X-Priority: batch` so
+    single-sheet users are served first.
+    """
+    from agents.orchestrator import evaluate_sheet
+    from agents.report_agent import generate_report
+    from utils.pdf_utils import extract_pdf_text, iter_pdf_images
+    from PIL import Image
+
+    priority_class = _priority_class(priority_header)
+    tenant = _tenant(request, tenant)
+    with start_trace("evaluate", filename=answer_sheet.filename) as trace, \
+            priority(priority_class, tenant):
+        try:
+            # 1. Process Answer Sheet (PyMuPDF renders from bytes; images open the upload directly)
+            answer_sheet_file = _upload_file(answer_sheet)
+            if answer_sheet.filename.lower().endswith(".pdf"):
+                answer_sheet_images = iter_pdf_images(answer_sheet_file.read())
+            else:
+                answer_sheet_images = [Image.open(answer_sheet_file)]
+
+            # 2. Process QP Text
+            final_qp_text = question_paper_text or ""
+            if question_paper:
+                 final_qp_text = extract_pdf_text(_upload_file(question_paper).read())
+    
+            if not final_qp_text:
+                raise HTTPException(status_code=400, detail="Question Paper text or file is required")
+
+            # 3. Process Solution Key
+            final_sol_text = solution_key_text or ""
+            if solution_key:
+                 final_sol_text = extract_pdf_text(_upload_file(solution_key).read())
+    
+            if not final_sol_text:
+                 raise HTTPException(status_code=400, detail="Solution Key text or file is required")
+
+            # --- ORCHESTRATION ---
+            # OCR runs in the background; each answer segment is matched and
+            # graded as soon as it is complete. Runs off the event loop so
+            # other requests are served while this one waits for inference.
+
+            page_texts = {}
+            graded_items = await run_in_threadpool(
+                bind(evaluate_sheet), answer_sheet_images, final_qp_text, final_sol_text,
+                on_page=page_texts.__setitem__)
+
+            if not graded_items:
+                 return {"error": "OCR failed to extract text or sheet was illegible."}
+
+            final_report = generate_report(graded_items)
+            if trace:
+                final_report["trace_id"] = trace.trace_id
+
+            # Keep transcripts and grades so a key correction can be regraded without OCR
+            exam_id = exam_id or results_store.new_exam_id()
             try:
-                sol_json = json.loads(final_sol_text)
-                if str(q_id) in sol_json:
-                     sol_text_q = sol_json[str(q_id)].get("text", final_sol_text)
-                     max_marks = sol_json[str(q_id)].get("marks", 10)
-                elif q_id in sol_json:
-                     sol_text_q = sol_json[q_id].get("text", final_sol_text)
-                     max_marks = sol_json[q_id].get("marks", 10)
-            except:
-                pass
-
-            grading_result = grade_answer(full_student_text, sol_text_q, max_marks)
-        else:
-            grading_result = {"marks_awarded": 0, "feedback": "Could not identify question."}
-
-        # Step 4: Report
-        graded_items = [{
-            "question_number": match_result.get("question_number"),
-            "question_text": match_result.get("question_text"),
-            "student_answer": full_student_text,
-            "marks_awarded": grading_result.get("marks_awarded", 0),
-            "max_marks": max_marks if 'max_marks' in locals() else 10,
-            "feedback": grading_result.get("feedback", "")
-        }]
-        
-        final_report = generate_report(graded_items)
-        return final_report
+                final_report["sheet_id"] = results_store.save_sheet(
+                    exam_id, page_texts, graded_items, label=answer_sheet.filename, tenant=tenant)
+                final_report["exam_id"] = exam_id
+            except Exception as e:
+                logger.error(f"Could not store results: {e}")
+
+            return final_report
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Evaluation failed: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/regrade")
+async def regrade(
+    request: Request,
+    exam_id: str = Form(...),
+    solution_key: Optional[UploadFile] = File(None),
+    solution_key_text: Optional[str] = Form(None),
+    tenant: Optional[str] = Header(None, alias="X-Tenant-ID")
+):
+    """
+    Re-grades stored sheets of an exam after a solution key correction.
+    Only questions whose solution text or marks changed are graded again, and
+    only on sheets the calling tenant stored. Runs as batch work: interactive evaluations are served first.
+    """
+    from agents.orchestrator import regrade_exam
+    from utils.pdf_utils import extract_pdf_text
+
+    final_sol_text = solution_key_text or ""
+    if solution_key:
+         final_sol_text = extract_pdf_text(_upload_file(solution_key).read())
+
+    if not final_sol_text:
+         raise HTTPException(status_code=400, detail="Solution Key text or file is required")
+
+    tenant = _tenant(request, tenant)
+    if not await run_in_threadpool(results_store.has_sheets, exam_id, tenant):
+        # Also what a caller sees after its address changed without an X-Tenant-ID header
+        raise HTTPException(status_code=404, detail=f"No stored sheets for exam {exam_id} under tenant {tenant}; "
+                                                    "send the X-Tenant-ID the sheets were evaluated with")
+
+    try:
+        with start_trace("regrade", exam_id=exam_id) as trace, priority(BATCH, tenant):
+            result = await run_in_threadpool(bind(regrade_exam), exam_id, final_sol_text, tenant=tenant)
+            if trace:
+                result["trace_id"] = trace.trace_id
+            return result
     except Exception as e:
-        logger.error(f"Evaluation failed: {e}")
+        logger.error(f"Regrade failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/analytics/{exam_id}")
+def class_analytics(exam_id: str):
+    """
+    Class-level statistics over every stored sheet of an exam: per-question
+    mean/median/distribution, difficulty and discrimination indices, outliers.
+    """
+    from agents.analytics_agent import compute_class_analytics
+    analytics = compute_class_analytics(exam_id)
+    if not analytics["students"]:
+        raise HTTPException(status_code=404, detail=f"No stored sheets for exam {exam_id}")
+    return analytics
+
+@app.get("/api/analytics/{exam_id}/scores.csv")
+def class_scores_csv(exam_id: str):
+    """Streams per-sheet, per-question scores of an exam as CSV."""
+    from agents.analytics_agent import iter_scores_csv
+    return StreamingResponse(iter_scores_csv(exam_id), media_type="text/csv",
+                             headers={"Content-Disposition": f'attachment; filename="{exam_id}-scores.csv"'})
@@ -1,23 +1,17 @@
 import streamlit as st
-import json
 import os
 import logging
-from dotenv import load_dotenv
-from PIL import Image
-import tempfile
+import hashlib
 import io
 
-# Import Agents
-from agents.ocr_agent import extract_text
-from agents.matcher_agent import match_answer_to_question
-from agents.grading_agent import grade_answer
-from agents.report_agent import generate_report
+from utils.env import load_env
 
-# Import Utils
-from utils.pdf_utils import pdf_to_images, extract_pdf_text
+# Load env vars (before the agents read their settings)
+load_env()
 
-# Load env vars
-load_dotenv()
+# The agents, PyMuPDF and PIL are imported where they are first used, so the
+# page renders before they are loaded.
+from utils.segmenter import segment_answers
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
@@ -47,30 +41,64 @@ st.sidebar.markdown("""
 # --- Input Section ---
 col1, col2 = st.columns([1, 1])
 
-# Helper to save uploaded file to temp
-def save_uploaded_file(uploaded_file):
-    if uploaded_file is None:
-        return None
-    suffix = os.path.splitext(uploaded_file.name)[1]
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(uploaded_file.getvalue())
-        return tmp.name
+# --- Cached stages ---
+# Streamlit re-runs this script on every interaction. Expensive stages are
+# cached by a hash of their input content; arguments starting with "_" are
+# not hashed by Streamlit, the explicit content hash is the key instead.
+
+def content_hash(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def rasterize_pdf(file_hash, _data):
+    from utils.pdf_utils import pdf_to_images
+    return pdf_to_images(_data)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def cached_pdf_text(file_hash, _data):
+    from utils.pdf_utils import extract_pdf_text
+    return extract_pdf_text(_data)
+
+class IllegiblePage(Exception):
+    pass
+
+@st.cache_data(show_spinner=False, max_entries=1024)
+def ocr_page(page_hash, _image):
+    from agents.ocr_agent import extract_text
+    page_text = extract_text(_image)
+    if page_text == "ILLEGIBLE":
+        # Raising keeps failures out of the cache so the next run retries
+        raise IllegiblePage()
+    return page_text
+
+@st.cache_data(show_spinner=False, max_entries=1024)
+def match_segment(segment_hash, qp_hash, _segment, _question_paper_text):
+    from agents.matcher_agent import match_answer_to_question
+    # Failed calls raise rather than come back UNIDENTIFIED, so they are not cached
+    return match_answer_to_question(_segment, _question_paper_text, raise_on_error=True)
+
+def load_answer_sheet(uploaded_file):
+    data = uploaded_file.getvalue()
+    file_hash = content_hash(data)
+    if uploaded_file.name.lower().endswith(".pdf"):
+        return file_hash, rasterize_pdf(file_hash, data)
+    from PIL import Image
+    return file_hash, [Image.open(io.BytesIO(data))]
 
 with col1:
     st.subheader("1. Answer Sheet")
     uploaded_answer_sheet = st.file_uploader("Upload Answer Sheet (PDF/Image)", type=["jpg", "png", "jpeg", "pdf"])
     
     answer_sheet_images = []
+    answer_sheet_hash = None
     
     if uploaded_answer_sheet:
-        file_path = save_uploaded_file(uploaded_answer_sheet)
-        if file_path.endswith(".pdf"):
-            with st.spinner("Converting PDF to images..."):
-                answer_sheet_images = pdf_to_images(file_path)
+        with st.spinner("Loading answer sheet..."):
+            answer_sheet_hash, answer_sheet_images = load_answer_sheet(uploaded_answer_sheet)
+        if len(answer_sheet_images) > 1:
             st.success(f"Loaded {len(answer_sheet_images)} pages.")
-        else:
-            image = Image.open(file_path)
-            answer_sheet_images = [image]
             
         # Display first page preview
         if answer_sheet_images:
@@ -85,8 +113,8 @@ with col2:
     with qp_tab1:
         uploaded_qp = st.file_uploader("Upload Question Paper (PDF)", type=["pdf"])
         if uploaded_qp:
-            qp_path = save_uploaded_file(uploaded_qp)
-            question_paper_text = extract_pdf_text(qp_path)
+            qp_data = uploaded_qp.getvalue()
+            question_paper_text = cached_pdf_text(content_hash(qp_data), qp_data)
             st.info(f"Extracted {len(question_paper_text)} characters.")
     with qp_tab2:
         qp_text_input = st.text_area("Question Paper Text", height=150, placeholder="Q1. Define Force...")
@@ -99,8 +127,8 @@ with col2:
     with key_tab1:
         uploaded_key = st.file_uploader("Upload Solution Key (PDF)", type=["pdf"])
         if uploaded_key:
-            key_path = save_uploaded_file(uploaded_key)
-            solution_key_text = extract_pdf_text(key_path)
+            key_data = uploaded_key.getvalue()
+            solution_key_text = cached_pdf_text(content_hash(key_data), key_data)
             st.info(f"Extracted {len(solution_key_text)} characters.")
     with key_tab2:
         key_text_input = st.text_area("Solution Key", height=150, placeholder='{"1": {"text": "...", "marks": 5}}')
@@ -114,10 +142,14 @@ if st.button("🚀 Run Evaluation", type="primary"):
     elif not question_paper_text.strip():
         st.error("Please provide the Question Paper text.")
     else:
+        from agents.grading_agent import grade_answer
+        from agents.report_agent import generate_report
+        from agents.orchestrator import lookup_solution
+
         st.markdown("---")
         st.header("🔍 Evaluation Progress")
         
-        # 1. OCR Step
+        # 1. OCR Step (cached per page: re-running after a key edit skips OCR)
         st.subheader("Step 1: OCR (Vision Agent)")
         full_student_text = ""
         
@@ -126,18 +158,10 @@ if st.button("🚀 Run Evaluation", type="primary"):
         for idx, img in enumerate(answer_sheet_images):
             st.write(f"Processing Page {idx + 1}/{len(answer_sheet_images)}...")
             try:
-                # Save current image frame to temp for OCR agent
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp_img:
-                    img.save(tmp_img.name)
-                    tmp_img_path = tmp_img.name
-                
-                page_text = extract_text(tmp_img_path)
-                
-                if page_text != "ILLEGIBLE":
-                    full_student_text += f"\n--- Page {idx+1} ---\n{page_text}"
-                else:
-                    st.warning(f"Page {idx+1} was illegible.")
-                    
+                page_text = ocr_page(f"{answer_sheet_hash}:{idx}", img)
+                full_student_text += f"\n--- Page {idx+1} ---\n{page_text}"
+            except IllegiblePage:
+                st.warning(f"Page {idx+1} was illegible.")
             except Exception as e:
                 st.error(f"Error on Page {idx+1}: {e}")
             
@@ -146,78 +170,69 @@ if st.button("🚀 Run Evaluation", type="primary"):
         with st.expander("View Full OCR Output", expanded=True):
             st.code(full_student_text, language="text")
 
-        # 2. Matching Step
-        st.subheader("Step 2: Matching (Reasoning Agent)")
-        # Note: In a real system, we might split the full text by "Q" or numbered list before matching.
-        # For V1, we pass the full text and ask Matcher to identify the *primary* question(s) or we could prompt it to list all.
-        # Since our Matcher currently returns a single JSON object (one question), this V1 Logic assumes 
-        # the answer sheet corresponds to ONE identifiable question or we just match the first one found.
-        # To improve, we should ask the Matcher to return a LIST of matches.
-        
-        # Let's simple-loop it: We can try to match the whole text. 
-        # If the student answered multiple questions, the current matcher prompt might get confused or just return one.
-        # For this demo, let's assume it finds the best match.
-        
-        with st.spinner("Matching answer to question..."):
-            try:
-                match_result = match_answer_to_question(full_student_text, question_paper_text)
-                
-                col_m1, col_m2 = st.columns(2)
-                col_m1.info(f"**Matched Question ID:** {match_result.get('question_number')}")
-                col_m2.text(f"Matched Text: {match_result.get('question_text', '')}")
-                
-            except Exception as e:
-                st.error(f"Matching Error: {e}")
-                st.stop()
-                
-        # 3. Grading Step
-        st.subheader("Step 3: Grading (Reasoning Agent)")
-        if match_result.get("question_number") != "UNIDENTIFIED":
-            with st.spinner("Grading answer..."):
+        # Split the transcript into answers at "Q1", "Q2"... markers
+        segments = list(segment_answers([full_student_text]))
+        qp_hash = content_hash(question_paper_text)
+        graded_items = []
+
+        for seg_idx, segment in enumerate(segments):
+            if len(segments) > 1:
+                st.markdown(f"#### Answer {seg_idx + 1}/{len(segments)}")
+
+            # 2. Matching Step (cached per segment and question paper)
+            st.subheader("Step 2: Matching (Reasoning Agent)")
+            with st.spinner("Matching answer to question..."):
                 try:
-                    # Parse solution key for specific Q
-                    q_id = match_result.get("question_number")
-                    max_marks = 10 # Default
-                    sol_text_q = solution_key_text
-                    
-                    # Try simple JSON parsing
-                    try:
-                        sol_json = json.loads(solution_key_text)
-                        if str(q_id) in sol_json: # Handle string/int key diffs
-                            sol_text_q = sol_json[str(q_id)].get("text", solution_key_text)
-                            max_marks = sol_json[str(q_id)].get("marks", 10)
-                        elif q_id in sol_json:
-                             sol_text_q = sol_json[q_id].get("text", solution_key_text)
-                             max_marks = sol_json[q_id].get("marks", 10)
-                    except:
-                        pass # Treat as plain text
-                    
-                    grading_result = grade_answer(full_student_text, sol_text_q, max_marks)
-                    
-                    st.markdown(f"**Score:** `{grading_result.get('marks_awarded')} / {max_marks}`")
-                    st.info(f"**Feedback:** {grading_result.get('feedback')}")
+                    match_result = match_segment(content_hash(segment), qp_hash, segment, question_paper_text)
+                except Exception as e:
+                    # Not cached: rerunning the app tries this segment again
+                    st.error(f"Matching Error: {e}")
+                    match_result = {"question_number": "UNIDENTIFIED", "question_text": ""}
+
+                try:
+                    col_m1, col_m2 = st.columns(2)
+                    col_m1.info(f"**Matched Question ID:** {match_result.get('question_number')}")
+                    col_m2.text(f"Matched Text: {match_result.get('question_text', '')}")
                     
                 except Exception as e:
-                    st.error(f"Grading Error: {e}")
-        else:
-            st.write("Skipping grading for unidentified question.")
+                    st.error(f"Matching Error: {e}")
+                    st.stop()
+                    
+            # 3. Grading Step (always re-run: the key is what usually changes)
+            st.subheader("Step 3: Grading (Reasoning Agent)")
+            grading_result = {}
+            max_marks = 0
+            if match_result.get("question_number") != "UNIDENTIFIED":
+                with st.spinner("Grading answer..."):
+                    try:
+                        sol_text_q, max_marks, from_key = lookup_solution(solution_key_text, match_result.get("question_number"))
+                        grading_result = grade_answer(segment, sol_text_q, max_marks, from_key=from_key)
+                        
+                        st.markdown(f"**Score:** `{grading_result.get('marks_awarded')} / {max_marks}` "
+                                    f"(graded by: {grading_result.get('grading_tier')})")
+                        if grading_result.get("low_confidence"):
+                            st.warning("Low-confidence grade: the larger model failed, please review.")
+                        st.info(f"**Feedback:** {grading_result.get('feedback')}")
+                        
+                    except Exception as e:
+                        st.error(f"Grading Error: {e}")
+            else:
+                st.write("Skipping grading for unidentified question.")
+
+            graded_items.append({
+                "question_number": match_result.get("question_number"),
+                "question_text": match_result.get("question_text"),
+                "student_answer": segment[:500] + "..." if len(segment) > 500 else segment,
+                "marks_awarded": grading_result.get("marks_awarded", 0),
+                "max_marks": max_marks,
+                "feedback": grading_result.get("feedback", "N/A"),
+                "grading_tier": grading_result.get("grading_tier"),
+                "low_confidence": grading_result.get("low_confidence", False),
+                "latency_saved_s": grading_result.get("latency_saved_s", 0),
+                "cost_saved": grading_result.get("cost_saved", 0)
+            })
 
         # 4. Report Step
         st.subheader("Step 4: Final Report")
-        
-        # Construct report item
-        marks = grading_result.get("marks_awarded", 0) if 'grading_result' in locals() else 0
-        fdback = grading_result.get("feedback", "") if 'grading_result' in locals() else "N/A"
-        maxim = max_marks if 'max_marks' in locals() else 0
-        
-        graded_items = [{
-            "question_number": match_result.get("question_number"),
-            "question_text": match_result.get("question_text"),
-            "student_answer": full_student_text[:500] + "..." if len(full_student_text) > 500 else full_student_text,
-            "marks_awarded": marks,
-            "max_marks": maxim,
-            "feedback": fdback
-        }]
-        
         report = generate_report(graded_items)
         st.json(report)
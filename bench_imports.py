@@ -0,0 +1,170 @@
+"""
+Import-time benchmark for the entry points.
+
+Runs `python -X importtime -c "import <entry point>"` in fresh interpreters
+and compares the median cumulative import time with a per-entry-point budget.
+For the REST API it also times process start to the first answered
+`GET /health` under uvicorn, lifespan startup and model warm-up included.
+
+    python bench_imports.py              # table, exit 1 if over budget
+    python bench_imports.py --runs 10 --json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Median cumulative import time allowed per entry point, in milliseconds
+IMPORT_BUDGET_MS = {
+    "api": 400,
+    "main": 550,
+    "app": 400,
+}
+
+# Median time from process start to the first answered GET /health, in milliseconds
+READY_BUDGET_MS = {
+    "api": 1000,
+}
+READY_TIMEOUT_S = 30
+
+# Heavy modules the entry points must not load until a request needs them
+LAZY_MODULES = ("fitz", "numpy", "PIL.Image", "requests", "agents.orchestrator",
+                "agents.ocr_agent", "agents.analytics_agent", "utils.hf_client")
+LAZY_ENTRY_POINTS = ("api", "main")
+
+def _run(code, importtime=False):
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    return subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True, check=True)
+
+def parse_importtime(stderr):
+    """
+    Parses `-X importtime` output.
+    Returns:
+        list[tuple]: (module, self_us, cumulative_us, depth) per imported module.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+def measure(entry_point, runs=5):
+    """
+    Imports `entry_point` in `runs` fresh interpreters.
+    Returns:
+        dict: "median_ms", "runs_ms" and the "heaviest" direct imports of the median run.
+    """
+    samples = []
+    for _ in range(runs):
+        rows = parse_importtime(_run(f"import {entry_point}", importtime=True).stderr)
+        # A module's imports are listed before it; the entry point's run from the
+        # previous top-level line (e.g. `site`) up to its own line
+        end = next(i for i, (name, _, _, depth) in enumerate(rows) if name == entry_point and depth == 0)
+        start = max((i for i in range(end) if rows[i][3] == 0), default=-1) + 1
+        samples.append((rows[end][2], rows[start:end]))
+    samples.sort(key=lambda sample: sample[0])
+    median_total, median_rows = samples[len(samples) // 2]
+    children = [(name, cum) for name, _, cum, depth in median_rows if depth == 1]
+    return {
+        "median_ms": round(statistics.median(total for total, _ in samples) / 1000, 1),
+        "runs_ms": [round(total / 1000, 1) for total, _ in samples],
+        "heaviest": [(name, round(cum / 1000, 1)) for name, cum in sorted(children, key=lambda c: -c[1])[:5]],
+    }
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def time_to_ready(entry_point, runs=5, env=None):
+    """
+    Serves `<entry_point>:app` with uvicorn in `runs` fresh processes and polls
+    /health until it answers. Warm-up runs as configured, so the time includes
+    whatever its thread costs the server while starting.
+    Args:
+        env (dict): Environment for the server (default: inherited).
+    Returns:
+        dict: "median_ms" and "runs_ms".
+    """
+    samples = []
+    for _ in range(runs):
+        port = _free_port()
+        started = time.monotonic()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", f"{entry_point}:app", "--port", str(port), "--log-level", "warning"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"{entry_point} exited with code {server.returncode} before it was ready")
+                if time.monotonic() - started > READY_TIMEOUT_S:
+                    raise RuntimeError(f"{entry_point} not ready after {READY_TIMEOUT_S}s")
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                        if response.status == 200:
+                            break
+                except OSError:
+                    time.sleep(0.005)
+            samples.append(time.monotonic() - started)
+        finally:
+            server.terminate()
+            server.wait()
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "runs_ms": sorted(round(sample * 1000, 1) for sample in samples),
+    }
+
+def eagerly_loaded(entry_point, modules=LAZY_MODULES):
+    """Returns the `modules` that importing `entry_point` already loads."""
+    code = (f"import sys, json, {entry_point}; "
+            f"print(json.dumps([m for m in {list(modules)!r} if m in sys.modules]))")
+    # Last line only: imported modules may print warnings of their own
+    return json.loads(_run(code).stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("entry_points", nargs="*", default=list(IMPORT_BUDGET_MS))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for entry_point in args.entry_points:
+        result = measure(entry_point, args.runs)
+        result["budget_ms"] = IMPORT_BUDGET_MS.get(entry_point)
+        result["within_budget"] = result["budget_ms"] is None or result["median_ms"] <= result["budget_ms"]
+        if entry_point in LAZY_ENTRY_POINTS:
+            result["eagerly_loaded"] = eagerly_loaded(entry_point)
+        if entry_point in READY_BUDGET_MS:
+            ready = time_to_ready(entry_point, args.runs)
+            result["ready_ms"] = ready["median_ms"]
+            result["ready_budget_ms"] = READY_BUDGET_MS[entry_point]
+            result["within_budget"] = result["within_budget"] and ready["median_ms"] <= READY_BUDGET_MS[entry_point]
+        results[entry_point] = result
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for entry_point, result in results.items():
+            status = "ok" if result["within_budget"] else "OVER BUDGET"
+            print(f"{entry_point:6} {result['median_ms']:8.1f} ms  (budget {result['budget_ms']} ms)  {status}")
+            if "ready_ms" in result:
+                print(f"       {result['ready_ms']:8.1f} ms  to first /health (budget {result['ready_budget_ms']} ms)")
+            for name, ms in result["heaviest"]:
+                print(f"         {ms:8.1f} ms  {name}")
+            if result.get("eagerly_loaded"):
+                print(f"         loaded at import: {', '.join(result['eagerly_loaded'])}")
+    return 0 if all(r["within_budget"] and not r.get("eagerly_loaded") for r in results.values()) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Offline throughput comparison from a recorded inference cassette.
+
+Replays every recorded call through a fresh inference scheduler: calls arrive
+at their recorded times (or all at once) and hold a slot for their recorded
+duration. Each scheduler setting is compared on makespan, throughput and
+queue wait per priority class. No network access is needed. With --speedup,
+the scheduler's 60 s over-target window is not scaled.
+
+    python bench_replay.py cassettes/inference.jsonl.gz --concurrency 4 8 16 --speedup 60
+"""
+import sys
+import time
+import argparse
+import threading
+
+from utils.cassette import load_entries
+from utils.scheduler import InferenceScheduler, PRIORITY_CLASSES, INTERACTIVE, INTERACTIVE_TARGET_WAIT_S
+
+def replay(entries, concurrency, reserved=None, speedup=1.0, burst=False):
+    """
+    Replays `entries` against an InferenceScheduler(concurrency, reserved).
+    Returns:
+        dict: "calls", "makespan_s", "calls_per_min" and per-class queue wait
+              stats, all in recorded (unscaled) time.
+    """
+    scheduler = InferenceScheduler(concurrency=concurrency, reserved=reserved,
+                                   target_wait_s=INTERACTIVE_TARGET_WAIT_S / speedup)
+    entries = sorted(entries, key=lambda e: e["started_at"])
+    first = entries[0]["started_at"]
+
+    def call(entry):
+        with scheduler.slot(entry.get("priority", INTERACTIVE), entry.get("tenant", "default")):
+            time.sleep(entry.get("duration_s", entry["latency_s"]) / speedup)
+
+    started = time.monotonic()
+    threads = []
+    for entry in entries:
+        if not burst:
+            delay = (entry["started_at"] - first) / speedup - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+        thread = threading.Thread(target=call, args=(entry,), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    makespan = (time.monotonic() - started) * speedup
+
+    stats = scheduler.stats()
+    result = {
+        "concurrency": scheduler.concurrency,
+        "interactive_reserved_slots": scheduler.reserved,
+        "calls": len(entries),
+        "makespan_s": round(makespan, 2),
+        "calls_per_min": round(len(entries) / makespan * 60, 2) if makespan else 0.0,
+    }
+    for cls in PRIORITY_CLASSES:
+        result[cls] = {key: round(stats[cls][key] * speedup, 3)
+                       for key in ("wait_mean_s", "wait_p95_s", "wait_max_s")}
+        result[cls]["served"] = stats[cls]["served"]
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("cassette")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--reserved", type=int, default=None, help="interactive reserved slots")
+    parser.add_argument("--speedup", type=float, default=1.0, help="replay this many times faster")
+    parser.add_argument("--burst", action="store_true", help="submit every call at once")
+    args = parser.parse_args(argv)
+
+    entries = load_entries(args.cassette)
+    if not entries:
+        print(f"No recorded calls in {args.cassette}")
+        return 1
+    print(f"{len(entries)} recorded calls")
+    for concurrency in args.concurrency:
+        r = replay(entries, concurrency, args.reserved, args.speedup, args.burst)
+        print(f"concurrency {r['concurrency']:3} (reserved {r['interactive_reserved_slots']}): "
+              f"makespan {r['makespan_s']:8.1f}s  {r['calls_per_min']:8.1f} calls/min  "
+              + "  ".join(f"{cls} wait p95 {r[cls]['wait_p95_s']:.2f}s" for cls in PRIORITY_CLASSES))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,27 +1,37 @@
-import os
 import logging
 import json
+from contextlib import asynccontextmanager
 from mcp.server.fastmcp import FastMCP
-from dotenv import load_dotenv
+from utils.env import load_env
 
-# Import Agents
-from agents.ocr_agent import extract_text
-from agents.matcher_agent import match_answer_to_question
-from agents.grading_agent import grade_answer
-from agents.report_agent import generate_report
+# Load Environment (before anything reads settings at import time)
+load_env()
+
+# Agents and NumPy are imported inside the tools that use them: MCP clients
+# often spawn this server per session, so launch time matters.
+from utils import results_store
+from utils.tracing import start_trace
+from utils.scheduler import scheduler, priority, INTERACTIVE, BATCH, PRIORITY_CLASSES
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load Environment
-load_dotenv()
-
 # Initialize MCP Server
-mcp = FastMCP("AnswerSheetEvaluator")
+@asynccontextmanager
+async def lifespan(server):
+    # Start loading cold models before the first tool call
+    from utils.warmup import start_background_warming
+    stop_keep_warm = start_background_warming()
+    yield
+    if stop_keep_warm:
+        stop_keep_warm.set()
+
+mcp = FastMCP("AnswerSheetEvaluator", lifespan=lifespan)
 
 @mcp.tool()
-def evaluate_answer_sheet(image_path: str, question_paper_text: str, solution_key: str) -> str:
+def evaluate_answer_sheet(image_path: str, question_paper_text: str, solution_key: str, exam_id: str = "",
+                          priority_class: str = INTERACTIVE) -> str:
     """
     Evaluates a handwritten answer sheet image against a question paper and solution key.
     
@@ -31,83 +41,102 @@ def evaluate_answer_sheet(image_path: str, question_paper_text: str, solution_ke
         solution_key: JSON string or plain text containing the solutions. 
                       If JSON, expected format: {"1a": {"text": "...", "marks": 5}, ...}
                       If plain text, the grading agent will rely on context.
+        exam_id: Optional id grouping sheets of one exam for later regrading (new one if empty).
+        priority_class: "interactive" (default) or "batch". Bulk runs should use
+                        "batch" so single-sheet evaluations are served first.
     
     Returns:
         JSON string containing the final evaluation report.
     """
-    logger.info(f"Starting evaluation for: {image_path}")
-    
-    # --- Step 1: OCR ---
-    logger.info("Step 1: Running OCR...")
-    student_text = extract_text(image_path)
+    from agents.orchestrator import evaluate_sheet
+    from agents.report_agent import generate_report
+
+    if priority_class not in PRIORITY_CLASSES:
+        return json.dumps({"error": f"priority_class must be one of: {', '.join(PRIORITY_CLASSES)}"})
+
+    with start_trace("evaluate_answer_sheet", image_path=image_path) as trace, priority(priority_class, "mcp"):
+        logger.info(f"Starting evaluation for: {image_path}")
     
-    if student_text == "ILLEGIBLE":
-         return json.dumps({"error": "Could not read answer sheet."})
+        # --- Steps 1-3: OCR, Match & Grade (pipelined) ---
+        # The OCR text is split into answers at "Q1", "Q2"... markers; each answer
+        # is matched and graded as soon as it is complete.
+        logger.info("Steps 1-3: Running OCR, matching and grading...")
+        page_texts = {}
+        graded_items = evaluate_sheet([image_path], question_paper_text, solution_key,
+                                      on_page=page_texts.__setitem__)
+
+        if not graded_items:
+             return json.dumps({"error": "Could not read answer sheet."})
+
+        logger.info(f"Graded {len(graded_items)} answer segment(s).")
+
+        # --- Step 4: Reporting ---
+        logger.info("Step 4: Generating Report...")
+        final_report = generate_report(graded_items)
+        if trace:
+            final_report["trace_id"] = trace.trace_id
+
+        exam_id = exam_id or results_store.new_exam_id()
+        try:
+            final_report["sheet_id"] = results_store.save_sheet(exam_id, page_texts, graded_items,
+                                                                label=image_path, tenant="mcp")
+            final_report["exam_id"] = exam_id
+        except Exception as e:
+            logger.error(f"Could not store results: {e}")
     
-    logger.info(f"OCR Output: {student_text[:100]}...") # Log first 100 chars
-
-    # --- Step 2 & 3: Match & Grade Loop ---
-    # NOTE: In a real complex scenario, we might need to segment the OCR text if it contains multiple answers.
-    # For this v1, we assume the OCR text represents a chunk that contains one or more answers, 
-    # but the Matcher Agent will try to find the *primary* question it answers or we might need to split it.
-    # 
-    # To make this robust for a full sheet, we'd ideally splits by "Q1", "Q2" etc.
-    # For now, let's assume the user might pass a cropped image or the text acts as a stream.
-    # Let's try to match the WHOLE text to a question, or iterate if we had a segmenter.
-    #
-    # Simplification for V1: Treat the entire OCR text as the "Student Answer" to be matched.
+        return json.dumps(final_report, indent=2)
+
+@mcp.tool()
+def regrade_exam_sheets(exam_id: str, solution_key: str) -> str:
+    """
+    Re-grades every stored sheet of an exam after the solution key was corrected.
+    Uses the stored transcripts and question matches; only questions whose
+    solution or marks changed are graded again.
     
-    logger.info("Step 2: Matching Answer to Question...")
-    match_result = match_answer_to_question(student_text, question_paper_text)
+    Args:
+        exam_id: The exam id returned by evaluate_answer_sheet.
+        solution_key: The corrected solution key (JSON string or plain text).
     
-    question_id = match_result.get("question_number")
-    question_text = match_result.get("question_text")
+    Returns:
+        JSON string with the number of regraded answers and the rebuilt reports.
+    """
+    from agents.orchestrator import regrade_exam
+
+    logger.info(f"Regrading exam: {exam_id}")
+    if not results_store.has_sheets(exam_id, tenant="mcp"):
+        return json.dumps({"error": f"No stored sheets for exam {exam_id}."})
+    with start_trace("regrade", exam_id=exam_id) as trace, priority(BATCH, "mcp"):
+        result = regrade_exam(exam_id, solution_key, tenant="mcp")
+        if trace:
+            result["trace_id"] = trace.trace_id
+    return json.dumps(result, indent=2)
+
+@mcp.tool()
+def class_analytics(exam_id: str) -> str:
+    """
+    Summarises every stored sheet of an exam.
     
-    graded_items = []
+    Args:
+        exam_id: The exam id returned by evaluate_answer_sheet.
     
-    if question_id == "UNIDENTIFIED":
-        # Create a report item for unidentified content
-        graded_items.append({
-            "question_number": "UNIDENTIFIED",
-            "student_answer": student_text,
-            "feedback": "Could not match to any question in the paper.",
-            "marks_awarded": 0,
-            "max_marks": 0
-        })
-    else:
-        logger.info(f"Matched to Question: {question_id}")
-        
-        # Parse Solution Key if it's JSON to find specific solution/marks
-        solution_text_for_q = solution_key
-        max_marks = 10 # Default
-        
-        try:
-            sol_json = json.loads(solution_key)
-            if question_id in sol_json:
-                solution_text_for_q = sol_json[question_id].get("text", "")
-                max_marks = sol_json[question_id].get("marks", 10)
-        except:
-            # solution_key is likely plain text, pass it all or let agent handle
-            pass
-
-        # --- Step 3: Grading ---
-        logger.info("Step 3: Grading...")
-        grading_result = grade_answer(student_text, solution_text_for_q, max_marks)
-        
-        graded_items.append({
-            "question_number": question_id,
-            "question_text": question_text,
-            "student_answer": student_text,
-            "marks_awarded": grading_result.get("marks_awarded", 0),
-            "max_marks": max_marks,
-            "feedback": grading_result.get("feedback", "")
-        })
-
-    # --- Step 4: Reporting ---
-    logger.info("Step 4: Generating Report...")
-    final_report = generate_report(graded_items)
+    Returns:
+        JSON string with per-question mean, median, score distribution,
+        difficulty and discrimination indices, and outlier sheets.
+    """
+    from agents.analytics_agent import compute_class_analytics
+
+    return json.dumps(compute_class_analytics(exam_id), indent=2)
+
+@mcp.tool()
+def inference_queue_stats() -> str:
+    """
+    Reports the shared inference scheduler's state.
     
-    return json.dumps(final_report, indent=2)
+    Returns:
+        JSON string with queue depth, calls in flight and queue wait times
+        for the interactive and batch priority classes.
+    """
+    return json.dumps(scheduler.stats(), indent=2)
 
 if __name__ == "__main__":
     mcp.run()
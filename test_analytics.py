@@ -0,0 +1,105 @@
+import csv
+import io
+
+import numpy as np
+import pytest
+
+from agents.analytics_agent import compute_class_analytics, export_scores, iter_scores_csv, load_scores, summarize_scores
+from utils import results_store, tracing
+
+# (question, marks awarded, max marks) per answer segment, one list per sheet
+SHEETS = [
+    # Question 10 answered in two segments: 2 + 1
+    [("10", 2, 4), ("1", 4, 4), ("2", 2, 2), ("10", 1, 4)],
+    # Over-awarded: clipped to the max marks
+    [("1", 2, 4), ("2", 0, 2), ("10", 5, 4)],
+    # Question 10 not attempted; the unidentified segment is ignored
+    [("2", 1, 2), ("1", 0, 4), ("UNIDENTIFIED", 3, 0)],
+]
+
+@pytest.fixture
+def exam(monkeypatch, tmp_path):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+    db_path = str(tmp_path / "results.db")
+    sheet_ids = [results_store.save_sheet("exam", {1: "page"}, [
+        {"question_number": question, "marks_awarded": marks, "max_marks": max_marks}
+        for question, marks, max_marks in answers], db_path=db_path) for answers in SHEETS]
+    return db_path, sheet_ids
+
+def test_load_scores_builds_the_sheet_question_matrix(exam):
+    db_path, sheet_ids = exam
+    data = load_scores("exam", db_path)
+
+    assert data["sheet_ids"] == sheet_ids
+    assert data["questions"].tolist() == ["1", "2", "10"]
+    assert data["max_marks"].tolist() == [4, 2, 4]
+    assert data["scores"].tolist() == [[4, 2, 3], [2, 0, 4], [0, 1, 0]]
+    assert data["attempted"].tolist() == [[True, True, True], [True, True, True], [True, True, False]]
+
+def test_long_question_labels_stay_distinct(tmp_path):
+    db_path = str(tmp_path / "results.db")
+    prefix = "Section B, long-form question part "
+    results_store.save_sheet("exam", {}, [
+        {"question_number": prefix + "one", "marks_awarded": 1, "max_marks": 2},
+        {"question_number": prefix + "two", "marks_awarded": 2, "max_marks": 2},
+    ], db_path=db_path)
+
+    data = load_scores("exam", db_path)
+    assert data["questions"].tolist() == [prefix + "one", prefix + "two"]
+    assert data["scores"].tolist() == [[1, 2]]
+
+def test_class_statistics(exam):
+    db_path, _ = exam
+    analytics = compute_class_analytics("exam", db_path)
+    questions = {q["question_number"]: q for q in analytics["questions"]}
+
+    assert analytics["students"] == 3
+    assert analytics["overall"] == {"total_possible_marks": 10.0, "mean": round(16 / 3, 4), "median": 6.0,
+                                    "std": round(float(np.std([9, 6, 1])), 4), "mean_percentage": 53.33}
+    assert [questions[q]["difficulty_index"] for q in ("1", "2", "10")] == [0.5, 0.5, round(7 / 12, 4)]
+    # One sheet per group: best total (9) minus worst (1), over the max marks
+    assert [questions[q]["discrimination_index"] for q in ("1", "2", "10")] == [1.0, 0.5, 0.75]
+    assert questions["10"]["attempt_rate"] == round(2 / 3, 4)
+    assert questions["1"]["distribution"] == [1, 0, 0, 0, 0, 1, 0, 0, 0, 1]
+
+    scores = np.array([[4, 2, 3], [2, 0, 4], [0, 1, 0]], dtype=float)
+    for i, q in enumerate(("1", "2", "10")):
+        rest = scores.sum(axis=1) - scores[:, i]
+        expected = np.corrcoef(scores[:, i], rest)[0, 1]
+        assert questions[q]["item_total_correlation"] == pytest.approx(expected, abs=1e-4)
+
+def test_mad_outliers():
+    totals = np.array([10, 11, 9, 10, 12, 8, 10, 11, 9, 100], dtype=float)
+    data = {"sheet_ids": [f"s{i}" for i in range(len(totals))], "questions": np.array(["1"]),
+            "max_marks": np.array([100.0]), "scores": totals[:, None], "attempted": np.ones((10, 1), bool)}
+
+    outliers = summarize_scores(data)["outliers"]
+
+    # Median 10, MAD 1: robust z of the 100 is 0.6745 * 90
+    assert outliers == [{"sheet_id": "s9", "total": 100.0, "robust_z": round(0.6745 * 90, 2)}]
+
+def test_csv_is_streamed_in_chunks(exam):
+    db_path, sheet_ids = exam
+    chunks = list(iter_scores_csv("exam", db_path, chunk_rows=2))
+
+    assert len(chunks) == 2
+    rows = list(csv.reader(io.StringIO("".join(chunks))))
+    assert rows[0] == ["sheet_id", "total", "Q1", "Q2", "Q10"]
+    assert rows[1:] == [[sheet_ids[0], "9.0", "4.0", "2.0", "3.0"],
+                        [sheet_ids[1], "6.0", "2.0", "0.0", "4.0"],
+                        [sheet_ids[2], "1.0", "0.0", "1.0", "0.0"]]
+
+def test_export_scores(exam, tmp_path):
+    db_path, sheet_ids = exam
+    csv_path = export_scores("exam", str(tmp_path / "scores.csv"), db_path, chunk_rows=1)
+    assert open(csv_path, newline="").read() == "".join(iter_scores_csv("exam", db_path))
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pq.read_table(export_scores("exam", str(tmp_path / "scores.parquet"), db_path, chunk_rows=2))
+    assert table.column_names == ["sheet_id", "total", "Q1", "Q2", "Q10"]
+    assert table.column("sheet_id").to_pylist() == sheet_ids
+    assert table.column("total").to_pylist() == [9.0, 6.0, 1.0]
+
+def test_empty_exam(tmp_path):
+    analytics = compute_class_analytics("missing", str(tmp_path / "results.db"))
+    assert analytics["students"] == 0 and analytics["questions"] == []
@@ -0,0 +1,74 @@
+import time
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from utils import scheduler as scheduler_module
+from utils import tracing
+from utils.scheduler import InferenceScheduler, INTERACTIVE, BATCH
+
+QP = "Q1. Define force."
+
+@pytest.fixture
+def client(monkeypatch):
+    sched = InferenceScheduler(concurrency=2, reserved=1)
+    order = []
+
+    def fake_evaluate_sheet(pages, question_paper_text, solution_key_text, on_page=None):
+        # One inference call under the request's priority, like the OCR agent's
+        with sched.slot() as slot:
+            order.append(slot.priority_class)
+        return [{"question_number": "1", "question_text": "Define force.", "student_answer": "push",
+                 "marks_awarded": 1, "max_marks": 1}]
+
+    monkeypatch.setattr(scheduler_module, "scheduler", sched)
+    monkeypatch.setattr("agents.orchestrator.evaluate_sheet", fake_evaluate_sheet)
+    monkeypatch.setattr(api.results_store, "save_sheet", lambda *args, **kwargs: "sheet")
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+    return TestClient(api.app), sched, order
+
+def _evaluate(client, priority_header=None):
+    headers = {"X-Priority": priority_header} if priority_header else {}
+    files = {"answer_sheet": ("sheet.pdf", b"%PDF", "application/pdf")}
+    return client.post("/api/evaluate", files=files, headers=headers,
+                       data={"question_paper_text": QP, "solution_key_text": "push"})
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+def test_batch_evaluation_waits_behind_interactive(client, monkeypatch):
+    client, sched, order = client
+    # Page rendering is not under test; the fake evaluate_sheet ignores the pages
+    monkeypatch.setattr("utils.pdf_utils.iter_pdf_images", lambda data: iter(()))
+    held = [sched.acquire(INTERACTIVE, "other"), sched.acquire(INTERACTIVE, "other")]
+    responses = {}
+
+    def post(priority_header):
+        responses[priority_header] = _evaluate(client, priority_header)
+
+    batch = threading.Thread(target=post, args=("batch",))
+    batch.start()
+    _wait_until(lambda: sched.stats()[BATCH]["queued"] == 1)
+    interactive = threading.Thread(target=post, args=("interactive",))
+    interactive.start()
+    _wait_until(lambda: sched.stats()[INTERACTIVE]["queued"] == 1)
+
+    # One slot frees up: the later interactive evaluation gets it first
+    held[0].release()
+    interactive.join(5)
+    batch.join(5)
+    held[1].release()
+
+    assert order == [INTERACTIVE, BATCH]
+    assert all(response.status_code == 200 for response in responses.values())
+
+def test_unknown_priority_is_rejected(client):
+    client, _, order = client
+    response = _evaluate(client, "urgent")
+    assert response.status_code == 400
+    assert order == []
@@ -0,0 +1,125 @@
+import os
+import io
+import tempfile
+
+import fitz  # PyMuPDF
+import pytest
+from PIL import Image
+from fastapi.testclient import TestClient
+from starlette.formparsers import MultiPartParser
+
+import api
+from utils import tracing
+
+N_REQUESTS = 10
+
+def _pdf_bytes(pages, text="Q1. Define force."):
+    doc = fitz.open()
+    for _ in range(pages):
+        doc.new_page().insert_text((72, 72), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+def _png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), "white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def _fake_evaluate_sheet(pages, question_paper_text, solution_key_text, on_page=None):
+    # Consume every page the way the OCR thread would, without calling a model
+    items = []
+    for number, page in enumerate(pages, start=1):
+        assert isinstance(page, Image.Image)
+        page.convert("RGB").tobytes()
+        if on_page:
+            on_page(number, "Q1 force is a push or pull")
+        items.append({"question_number": "1", "question_text": "Define force.",
+                      "student_answer": "force is a push or pull", "marks_awarded": 1, "max_marks": 1})
+    return items
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    # api imports the orchestrator on first use, so patch it at the source
+    monkeypatch.setattr("agents.orchestrator.evaluate_sheet", _fake_evaluate_sheet)
+    monkeypatch.setattr(api.results_store, "save_sheet", lambda *args, **kwargs: "sheet")
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+    # Force every upload to spill out of memory
+    monkeypatch.setattr(MultiPartParser, "spool_max_size", 16)
+    return TestClient(api.app)
+
+def _open_temp_files(directory):
+    # Spill files are anonymous (O_TMPFILE or unlinked) and never show up in a
+    # listing, but an open descriptor still points into the temp directory
+    links = []
+    for fd in os.listdir("/proc/self/fd"):
+        try:
+            links.append(os.readlink(f"/proc/self/fd/{fd}"))
+        except OSError:
+            pass
+    return [link for link in links if link.startswith(str(directory))]
+
+def _spill_files_opened(monkeypatch):
+    opened = []
+    temporary_file = tempfile.TemporaryFile
+
+    def tracking_temporary_file(*args, **kwargs):
+        f = temporary_file(*args, **kwargs)
+        opened.append(f)
+        return f
+
+    monkeypatch.setattr(tempfile, "TemporaryFile", tracking_temporary_file)
+    return opened
+
+def test_no_leftover_files_after_requests(client, monkeypatch, tmp_path):
+    spilled = _spill_files_opened(monkeypatch)
+    sheet_pdf = _pdf_bytes(pages=3)
+    qp_pdf = _pdf_bytes(pages=1, text="Q1. Define force. (1 mark)")
+    before = set(os.listdir(tmp_path))
+
+    for i in range(N_REQUESTS):
+        if i % 2:
+            files = {"answer_sheet": ("sheet.pdf", sheet_pdf, "application/pdf")}
+        else:
+            files = {"answer_sheet": ("sheet.png", _png_bytes(), "image/png")}
+        files["question_paper"] = ("qp.pdf", qp_pdf, "application/pdf")
+        response = client.post("/api/evaluate", files=files, data={"solution_key_text": "push or pull"})
+        assert response.status_code == 200, response.text
+        assert response.json()["summary"]["total_marks_obtained"] == (3 if i % 2 else 1)
+
+    assert set(os.listdir(tmp_path)) == before
+    # Every upload spilled to disk, and every spill file was closed
+    assert len(spilled) >= 2 * N_REQUESTS
+    assert all(f.closed for f in spilled)
+    assert _open_temp_files(tmp_path) == []
+
+def test_upload_over_limit_is_rejected(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(api, "UPLOAD_MAX_BYTES", 1024)
+    files = {"answer_sheet": ("sheet.pdf", _pdf_bytes(pages=20), "application/pdf")}
+    response = client.post("/api/evaluate", files=files,
+                           data={"question_paper_text": "Q1", "solution_key_text": "key"})
+    assert response.status_code == 413
+    assert os.listdir(tmp_path) == []
+    assert _open_temp_files(tmp_path) == []
+
+def test_declared_body_over_limit_is_rejected_before_parsing(client, monkeypatch):
+    monkeypatch.setattr(api, "UPLOAD_MAX_REQUEST_BYTES", 1024)
+    spilled = _spill_files_opened(monkeypatch)
+    files = {"answer_sheet": ("sheet.pdf", _pdf_bytes(pages=20), "application/pdf")}
+    response = client.post("/api/evaluate", files=files,
+                           data={"question_paper_text": "Q1", "solution_key_text": "key"})
+    assert response.status_code == 413
+    assert spilled == []
+
+def test_streamed_body_over_limit_is_cut_off(client, monkeypatch):
+    monkeypatch.setattr(api, "UPLOAD_MAX_REQUEST_BYTES", 64 * 1024)
+
+    def body():
+        # No Content-Length: the limit has to be enforced while reading
+        for _ in range(100):
+            yield b"x" * 4096
+
+    response = client.post("/api/evaluate", content=body(),
+                           headers={"Content-Type": "multipart/form-data; boundary=b"})
+    assert response.status_code == 413
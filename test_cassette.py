@@ -0,0 +1,61 @@
+import io
+import json
+
+import pytest
+import requests
+from urllib3 import HTTPResponse
+
+from utils import cassette, hf_client, tracing
+
+URL = "http://models.test/v1/chat"
+
+def _sse(*pieces):
+    events = [f"data: {json.dumps({'choices': [{'delta': {'content': p}}]})}\n\n" for p in pieces]
+    return ("".join(events) + "data: [DONE]\n\n").encode("utf-8")
+
+def _fake_post(url, headers=None, data=None, stream=False):
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.encoding = "utf-8"
+    if json.loads(data).get("stream"):
+        response.headers["Content-Type"] = "text/event-stream"
+        response.raw = HTTPResponse(body=io.BytesIO(_sse('{"marks": 4,', ' "feedback": "ok"}', " more")),
+                                    preload_content=False)
+    else:
+        response.headers["Content-Type"] = "application/json"
+        response._content = json.dumps({"choices": [{"message": {"content": "Q1 fórce"}}]}).encode("utf-8")
+    return response
+
+@pytest.fixture
+def cassette_path(monkeypatch, tmp_path):
+    path = str(tmp_path / "inference.jsonl.gz")
+    monkeypatch.setattr(cassette, "CASSETTE_PATH", path)
+    monkeypatch.setattr(hf_client, "HF_TOKEN", "token")
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+    return path
+
+def _calls():
+    return (hf_client.extract_content(hf_client.query_hf_inference({"messages": ["ocr"]}, URL)),
+            hf_client.stream_json_object({"messages": ["grade"]}, URL))
+
+def test_record_then_replay_without_network(monkeypatch, cassette_path):
+    monkeypatch.setattr(cassette, "CASSETTE_MODE", "record")
+    monkeypatch.setattr(requests, "post", _fake_post)
+    recorded = _calls()
+    assert recorded == ("Q1 fórce", {"marks": 4, "feedback": "ok"})
+
+    entries = cassette.load_entries(cassette_path)
+    assert [entry["stream"] for entry in entries] == [False, True]
+    assert all("messages" not in json.dumps(entry) for entry in entries)
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("replay must not touch the network")
+
+    monkeypatch.setattr(requests, "post", no_network)
+    monkeypatch.setattr(cassette, "CASSETTE_MODE", "replay")
+    monkeypatch.setattr(cassette, "REPLAY_TIMING", "fast")
+    assert _calls() == recorded
+
+    with pytest.raises(cassette.CassetteMiss):
+        hf_client.query_hf_inference({"messages": ["never recorded"]}, URL)
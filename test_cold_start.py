@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+import bench_imports
+
+@pytest.mark.parametrize("entry_point", bench_imports.LAZY_ENTRY_POINTS)
+def test_entry_point_defers_heavy_imports(entry_point):
+    assert bench_imports.eagerly_loaded(entry_point) == []
+
+def test_parse_importtime():
+    stderr = ("import time: self [us] | cumulative | imported package\n"
+              "import time:       100 |        100 |   utils.env\n"
+              "import time:       500 |        600 | api\n")
+    assert bench_imports.parse_importtime(stderr) == [("utils.env", 100, 100, 1), ("api", 500, 600, 0)]
+
+def test_warm_up_hook_defers_heavy_imports():
+    # The lifespan hooks import it on the startup path
+    assert bench_imports.eagerly_loaded("utils.warmup") == []
+
+def test_api_time_to_ready():
+    # No warm-up: with HF_TOKEN set it would send real, billed requests to every model
+    env = dict(os.environ, WARM_UP_ON_START="0", KEEP_WARM_WINDOWS="")
+    result = bench_imports.time_to_ready("api", runs=1, env=env)
+    assert 0 < result["median_ms"] < bench_imports.READY_TIMEOUT_S * 1000
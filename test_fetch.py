@@ -0,0 +1,115 @@
+import os
+import time
+
+import pytest
+import requests
+
+from utils import fetch
+from utils.fetch import FetchError, fetch_url
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=b"", headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = requests.structures.CaseInsensitiveDict(headers or {})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} error")
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    """Queue of responses served in order; records each request's headers."""
+    responses, requests_seen = [], []
+
+    def fake_get(url, headers=None, **kwargs):
+        requests_seen.append(headers or {})
+        return responses.pop(0)
+
+    monkeypatch.setattr(fetch, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(fetch._session, "get", fake_get)
+    return responses, requests_seen
+
+def _image(body=b"png", **headers):
+    return FakeResponse(200, body, dict({"Content-Type": "image/png"}, **headers))
+
+def test_not_modified_serves_the_cached_file(server):
+    responses, requests_seen = server
+    responses += [_image(b"page one", ETag='"v1"'), FakeResponse(304)]
+
+    first = fetch_url("https://example.com/sheet.png")
+    second = fetch_url("https://example.com/sheet.png")
+
+    assert first == second
+    assert open(second, "rb").read() == b"page one"
+    assert requests_seen[1]["If-None-Match"] == '"v1"'
+
+def test_body_over_the_limit_is_rejected(server, tmp_path):
+    responses, _ = server
+    responses.append(_image(b"x" * 100))
+
+    with pytest.raises(FetchError, match="limit"):
+        fetch_url("https://example.com/big.png", max_bytes=10)
+    assert os.listdir(tmp_path) == []
+
+def test_declared_length_over_the_limit_is_rejected(server):
+    responses, _ = server
+    responses.append(_image(b"", **{"Content-Length": "1000"}))
+
+    with pytest.raises(FetchError, match="limit is 10"):
+        fetch_url("https://example.com/big.png", max_bytes=10)
+
+def test_disallowed_content_type_is_rejected(server):
+    responses, _ = server
+    responses.append(FakeResponse(200, b"<html>", {"Content-Type": "text/html; charset=utf-8"}))
+
+    with pytest.raises(FetchError, match="text/html"):
+        fetch_url("https://example.com/login")
+
+def test_cache_evicts_least_recently_used(server, monkeypatch):
+    responses, _ = server
+    monkeypatch.setattr(fetch, "CACHE_MAX_BYTES", 25)
+    responses += [_image(b"a" * 10), _image(b"b" * 10)]
+    older, recent = (fetch_url(f"https://example.com/{n}.png") for n in range(2))
+    # Make the first download the older one regardless of timestamp resolution
+    os.utime(older, (time.time() - 60,) * 2)
+
+    responses.append(_image(b"c" * 10))
+    newest = fetch_url("https://example.com/2.png")
+
+    assert not os.path.exists(older) and not os.path.exists(older + ".json")
+    assert os.path.exists(recent) and os.path.exists(newest)
+
+def test_cache_evicts_entries_past_max_age(server, monkeypatch):
+    responses, _ = server
+    monkeypatch.setattr(fetch, "CACHE_MAX_AGE_S", 3600)
+    responses += [_image(b"a"), _image(b"b")]
+    stale = fetch_url("https://example.com/0.png")
+    os.utime(stale, (1, 1))
+
+    fetch_url("https://example.com/1.png")
+
+    assert not os.path.exists(stale)
+
+def test_stale_partial_downloads_are_removed(server, tmp_path):
+    responses, _ = server
+    stale, fresh = tmp_path / "tmpold.part", tmp_path / "tmpnew.part"
+    stale.write_bytes(b"x" * 10)
+    fresh.write_bytes(b"y" * 10)
+    os.utime(stale, (time.time() - fetch.READ_TIMEOUT_S - 60,) * 2)
+
+    responses.append(_image(b"a"))
+    fetch_url("https://example.com/0.png")
+
+    # The fresh one may belong to a download still in progress
+    assert not stale.exists() and fresh.exists()
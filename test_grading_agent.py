@@ -0,0 +1,71 @@
+import pytest
+
+from agents import grading_agent
+from agents.grading_agent import _grade_locally, grade_answer
+from agents.orchestrator import lookup_solution
+from agents.report_agent import generate_report
+from utils import tracing
+
+@pytest.fixture(autouse=True)
+def no_tracing(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+
+@pytest.mark.parametrize("answer, solution", [
+    ("Q1. 20 m/s", "20 m/s"),
+    ("Ans: 72 km/h", "20 m/s"),
+    ("The force is push or pull.", "the force is push or pull"),
+])
+def test_local_full_marks(answer, solution):
+    assert _grade_locally(answer, solution, 5)["marks_awarded"] == 5.0
+
+def test_local_lone_wrong_value_gets_zero():
+    assert _grade_locally("Q1. 4 N", "9 N", 10)["marks_awarded"] == 0.0
+
+@pytest.mark.parametrize("answer, solution", [
+    ("Q1. 4 N", "Q1: 4 N\nQ2: 9 N"),    # whole plain-text key
+    ("x = 5", "x = 5, y = 3"),          # partial answer to a two-value key
+    ("F = 3 N then 4 N", "4 N"),        # several values in the answer
+    ("20", "20 m/s"),                   # missing unit
+    ("The object accelerates because the net force is non-zero", "F = ma"),
+])
+def test_local_defers_to_a_model(answer, solution):
+    assert _grade_locally(answer, solution, 10) is None
+
+def test_lookup_solution_from_key():
+    key = '{"1": {"text": "4 N", "marks": 2}, "2": {"marks": 3}}'
+    assert lookup_solution(key, "1") == ("4 N", 2, True)
+    assert lookup_solution(key, "2") == (key, 3, False)
+    assert lookup_solution("Q1: 4 N\nQ2: 9 N", "1") == ("Q1: 4 N\nQ2: 9 N", 10, False)
+
+def test_plain_text_key_skips_local_tier(monkeypatch):
+    calls = []
+
+    def fake_model(model_url, student_answer, solution_text, max_marks):
+        calls.append(model_url)
+        return {"marks_awarded": 10.0, "feedback": "Correct.", "confidence": 0.95}
+
+    monkeypatch.setattr(grading_agent, "_grade_with_model", fake_model)
+    result = grade_answer("Q1. 4 N", "Q1: 4 N\nQ2: 9 N", 10)
+    assert result["marks_awarded"] == 10.0
+    assert result["grading_tier"] == "small"
+    assert calls == [grading_agent.SMALL_MODEL_URL]
+
+    calls.clear()
+    assert grade_answer("Q1. 4 N", "4 N", 10, from_key=True)["grading_tier"] == "local"
+    assert calls == []
+
+def test_failed_large_tier_keeps_low_confidence_grade(monkeypatch):
+    def fake_model(model_url, student_answer, solution_text, max_marks):
+        if model_url == grading_agent.MODEL_URL:
+            raise RuntimeError("endpoint down")
+        return {"marks_awarded": 6.0, "feedback": "Mostly right.", "confidence": 0.5}
+
+    monkeypatch.setattr(grading_agent, "_grade_with_model", fake_model)
+    result = grade_answer("The net force accelerates the cart", "F = ma", 10)
+    assert result["marks_awarded"] == 6.0
+    assert result["grading_tier"] == "small"
+    assert result["low_confidence"] is True
+
+    report = generate_report([dict(result, question_number="1", max_marks=10)])
+    assert report["details"][0]["low_confidence"] is True
+    assert report["summary"]["grading"]["low_confidence_answers"] == 1
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+import requests
+
+from utils import hf_client, tracing
+from utils.hf_client import first_json_object, loading_estimate
+from utils.scheduler import InferenceScheduler
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"marks": 4}', {"marks": 4}),
+    ('Sure! ```json\n{"marks": 4, "feedback": "ok"}\n``` done', {"marks": 4, "feedback": "ok"}),
+    ('{"feedback": "use } and { carefully", "marks": 1}', {"feedback": "use } and { carefully", "marks": 1}),
+    ('{"feedback": "a \\"quoted\\" }", "marks": 2}', {"feedback": 'a "quoted" }', "marks": 2}),
+    ('{"a": {"b": 1}} {"c": 2}', {"a": {"b": 1}}),
+    ('{not json} {"marks": 3}', {"marks": 3}),
+])
+def test_first_complete_object(text, expected):
+    assert first_json_object(text) == expected
+
+@pytest.mark.parametrize("text", ["", "no json here", '{"marks": 4', '{"feedback": "still } open'])
+def test_incomplete_object_returns_none(text):
+    assert first_json_object(text) is None
+
+def _response(status, body):
+    response = requests.Response()
+    response.status_code = status
+    response._content = (body if isinstance(body, str) else json.dumps(body)).encode("utf-8")
+    return response
+
+@pytest.mark.parametrize("status, body, expected", [
+    (503, {"error": "Model x is currently loading", "estimated_time": 20.5}, 20.5),
+    (503, {"error": "Model x is currently loading"}, 10.0),
+    (503, {"estimated_time": "soon"}, 10.0),
+    (503, {"error": "Service unavailable"}, None),
+    (503, "upstream down", None),
+    (503, ["loading"], None),
+    (200, {"estimated_time": 5}, None),
+])
+def test_loading_estimate(status, body, expected):
+    assert loading_estimate(_response(status, body)) == expected
+
+@pytest.fixture
+def endpoint(monkeypatch):
+    """Serves queued responses in place of the HTTP call; records sleeps and slots in use."""
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+    sched = InferenceScheduler(concurrency=1, reserved=0)
+    monkeypatch.setattr(hf_client, "scheduler", sched)
+    responses, in_flight, sleeps = [], [], []
+
+    def send(model_url, headers, body, stream=False, priority=None):
+        in_flight.append(sched.stats()["interactive"]["running"])
+        return responses.pop(0)
+
+    monkeypatch.setattr(hf_client.cassette, "send", send)
+    monkeypatch.setattr(hf_client.time, "sleep", sleeps.append)
+    return sched, responses, in_flight, sleeps
+
+LOADING = {"error": "Model x is currently loading", "estimated_time": 2.0}
+
+def test_post_waits_for_a_loading_model(endpoint):
+    sched, responses, in_flight, sleeps = endpoint
+    responses += [_response(503, LOADING), _response(200, {"ok": True})]
+
+    response, slot = hf_client._post("https://model", "{}")
+
+    assert response.status_code == 200
+    assert sleeps == [2.0]
+    # The slot is given back while waiting, so each attempt holds exactly one
+    assert in_flight == [1, 1]
+    assert sched.stats()["interactive"]["running"] == 1
+    slot.release()
+    assert sched.stats()["interactive"]["running"] == 0
+
+def test_post_returns_a_held_slot_after_the_deadline(endpoint, monkeypatch):
+    sched, responses, in_flight, sleeps = endpoint
+    monkeypatch.setattr(hf_client, "MODEL_LOADING_MAX_WAIT_S", 0)
+    responses.append(_response(503, LOADING))
+
+    response, slot = hf_client._post("https://model", "{}")
+
+    assert response.status_code == 503 and sleeps == []
+    assert sched.stats()["interactive"]["running"] == 1
+    slot.release()
+    assert sched.stats()["interactive"]["running"] == 0
+
+def test_query_raises_once_loading_outlasts_the_deadline(endpoint, monkeypatch):
+    sched, responses, _, _ = endpoint
+    monkeypatch.setattr(hf_client, "HF_TOKEN", "token")
+    monkeypatch.setattr(hf_client, "MODEL_LOADING_MAX_WAIT_S", 0)
+    responses.append(_response(503, LOADING))
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        hf_client.query_hf_inference({"messages": []}, "https://model")
+    assert sched.stats()["interactive"]["running"] == 0
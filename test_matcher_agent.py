@@ -0,0 +1,21 @@
+import pytest
+
+from agents import matcher_agent
+from agents.matcher_agent import match_answer_to_question
+from utils import tracing
+
+@pytest.fixture(autouse=True)
+def failing_model(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+
+    def fail(payload, model_url):
+        raise ConnectionError("endpoint unavailable")
+
+    monkeypatch.setattr(matcher_agent, "stream_json_object", fail)
+
+def test_failure_is_unidentified_by_default():
+    assert match_answer_to_question("F = ma", "Q1. State Newton's second law.")["question_number"] == "UNIDENTIFIED"
+
+def test_failure_raises_for_caching_callers():
+    with pytest.raises(ConnectionError):
+        match_answer_to_question("F = ma", "Q1. State Newton's second law.", raise_on_error=True)
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from agents import orchestrator
+from utils import results_store, tracing
+
+KEY = {"1": {"text": "F = ma", "marks": 4}, "2": {"text": "9 N", "marks": 2}}
+
+def _item(question, answer, marks_awarded):
+    entry = KEY[question]
+    return {"question_number": question, "question_text": f"Question {question}", "student_answer": answer,
+            "solution_text": entry["text"], "max_marks": entry["marks"], "marks_awarded": marks_awarded,
+            "feedback": "", "grading_tier": "small"}
+
+@pytest.fixture
+def graded(monkeypatch, tmp_path):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+    calls = []
+
+    def fake_grade(student_answer, solution_text, max_marks, from_key=False):
+        calls.append((student_answer, solution_text))
+        return {"marks_awarded": float(max_marks), "feedback": "Regraded.", "grading_tier": "small"}
+
+    monkeypatch.setattr(orchestrator, "grade_answer", fake_grade)
+    db_path = str(tmp_path / "results.db")
+    items = [_item("1", "F = ma", 4), _item("2", "4 N", 0)]
+    sheet_a = results_store.save_sheet("exam", {1: "page"}, items, db_path=db_path, tenant="teacher-a")
+    sheet_b = results_store.save_sheet("exam", {1: "page"}, items, db_path=db_path, tenant="teacher-b")
+    return db_path, calls, sheet_a, sheet_b
+
+def test_only_changed_questions_are_regraded(graded):
+    db_path, calls, sheet_a, sheet_b = graded
+    corrected = json.dumps(dict(KEY, **{"2": {"text": "4 N", "marks": 2}}))
+
+    result = orchestrator.regrade_exam("exam", corrected, db_path=db_path)
+
+    assert result["questions_changed"] == ["2"]
+    assert result["answers_regraded"] == 2
+    assert calls == [("4 N", "4 N")] * 2
+    items = results_store.load_graded_items(sheet_a, db_path)
+    assert [item["marks_awarded"] for item in items] == [4, 2]
+
+def test_regrade_only_touches_the_tenants_sheets(graded):
+    db_path, calls, sheet_a, sheet_b = graded
+    corrected = json.dumps(dict(KEY, **{"2": {"text": "4 N", "marks": 2}}))
+
+    result = orchestrator.regrade_exam("exam", corrected, db_path=db_path, tenant="teacher-a")
+
+    assert result["answers_regraded"] == 1
+    assert list(result["reports"]) == [sheet_a]
+    assert results_store.load_graded_items(sheet_b, db_path)[1]["solution_text"] == "9 N"
+
+def test_exam_ids_are_unique():
+    assert results_store.new_exam_id() != results_store.new_exam_id()
+
+def test_api_regrade_of_another_tenants_exam_is_not_found(graded, monkeypatch):
+    from fastapi.testclient import TestClient
+    import api
+
+    db_path, calls, sheet_a, _ = graded
+    monkeypatch.setattr(results_store, "RESULTS_DB", db_path)
+    has_sheets = results_store.has_sheets
+    monkeypatch.setattr(results_store, "has_sheets", lambda exam_id, tenant: has_sheets(exam_id, tenant, db_path))
+    client = TestClient(api.app)
+    corrected = json.dumps(dict(KEY, **{"2": {"text": "4 N", "marks": 2}}))
+
+    response = client.post("/api/regrade", data={"exam_id": "exam", "solution_key_text": corrected},
+                           headers={"X-Tenant-ID": "teacher-c"})
+    assert response.status_code == 404
+    assert "X-Tenant-ID" in response.json()["detail"]
+    assert calls == []
+
+    response = client.post("/api/regrade", data={"exam_id": "exam", "solution_key_text": corrected},
+                           headers={"X-Tenant-ID": "teacher-a"})
+    assert response.status_code == 200
+    assert list(response.json()["reports"]) == [sheet_a]
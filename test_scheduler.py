@@ -0,0 +1,72 @@
+import time
+import threading
+
+import pytest
+
+from utils.scheduler import InferenceScheduler, INTERACTIVE, BATCH
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+def _enqueue(scheduler, order, priority_class, tenant):
+    """Starts a call that records its tenant once admitted; returns after it is queued."""
+    queued = scheduler.stats()[priority_class]["queued"]
+
+    def call():
+        with scheduler.slot(priority_class, tenant):
+            order.append((priority_class, tenant))
+
+    thread = threading.Thread(target=call, daemon=True)
+    thread.start()
+    _wait_until(lambda: scheduler.stats()[priority_class]["queued"] == queued + 1)
+    return thread
+
+def test_batch_tenants_take_turns():
+    scheduler = InferenceScheduler(concurrency=2, reserved=1)
+    first = scheduler.acquire(BATCH, "A")
+    order = []
+    threads = [_enqueue(scheduler, order, BATCH, tenant) for tenant in ("A", "A", "A", "B", "B")]
+
+    first.release()
+    for thread in threads:
+        thread.join(5)
+
+    assert [tenant for _, tenant in order] == ["B", "A", "B", "A", "A"]
+
+def test_interactive_is_admitted_before_earlier_batch():
+    scheduler = InferenceScheduler(concurrency=2, reserved=1)
+    held = [scheduler.acquire(INTERACTIVE, "A"), scheduler.acquire(INTERACTIVE, "A")]
+    order = []
+    threads = [_enqueue(scheduler, order, BATCH, "B"), _enqueue(scheduler, order, INTERACTIVE, "C")]
+
+    # One slot frees up: the interactive call gets it, the batch call follows it
+    held[0].release()
+    for thread in threads:
+        thread.join(5)
+    held[1].release()
+
+    assert order == [(INTERACTIVE, "C"), (BATCH, "B")]
+
+def test_batch_never_takes_the_reserved_slots():
+    scheduler = InferenceScheduler(concurrency=2, reserved=1)
+    batch = scheduler.acquire(BATCH, "A")
+    order = []
+    waiting = _enqueue(scheduler, order, BATCH, "B")
+
+    # The reserved slot is still free for interactive work
+    interactive = scheduler.acquire(INTERACTIVE, "C")
+    assert order == [] and scheduler.stats()[BATCH]["queued"] == 1
+
+    interactive.release()
+    batch.release()
+    waiting.join(5)
+    assert order == [(BATCH, "B")]
+
+def test_unknown_priority_class_is_rejected():
+    from utils.scheduler import priority
+    with pytest.raises(ValueError):
+        with priority("urgent"):
+            pass
@@ -0,0 +1,42 @@
+import pytest
+
+from utils.segmenter import QUESTION_MARKER, segment_answers
+
+@pytest.mark.parametrize("line", ["Q1", "Q1.", "Q1)", "Q1:", "Q.2a)", "Q2a. Explain", "Question 3(b):", "Q 4 (c) text"])
+def test_marker_lines(line):
+    assert QUESTION_MARKER.match(line)
+
+@pytest.mark.parametrize("line", ["q1 = 2 uC", "Q1 = 4 N", "Q12 = 3", "Q2a+b", "Q1 Define force", "Ans 20 m/s", "q2."])
+def test_working_is_not_a_marker(line):
+    assert not QUESTION_MARKER.match(line)
+
+def test_physics_working_stays_with_its_answer():
+    page = ("Q1. Coulomb's law\n"
+            "F = k q1 q2 / r^2\n"
+            "q1 = 2 uC\n"
+            "q2 = 3 uC\n"
+            "F = 0.054 N\n"
+            "Q2. Ohm's law\n"
+            "V = IR\n")
+    segments = list(segment_answers([page]))
+    assert len(segments) == 2
+    assert segments[0].startswith("Q1.") and segments[0].endswith("F = 0.054 N")
+    assert segments[1] == "Q2. Ohm's law\nV = IR"
+
+def test_answers_continue_across_pages():
+    pages = ["--- Page 1 ---\nQ1. first part\n", "--- Page 2 ---\nsecond part\nQ2) next\n"]
+    assert list(segment_answers(pages)) == [
+        "Q1. first part\n--- Page 2 ---\nsecond part",
+        "Q2) next",
+    ]
+
+def test_sheet_without_markers_is_one_segment():
+    assert list(segment_answers(["just some working\n", "more working"])) == ["just some working\nmore working"]
+
+def test_segments_are_yielded_before_the_last_page():
+    def pages():
+        yield "Q1. a\n"
+        yield "Q2. b\n"
+        raise AssertionError("third page requested before Q1 was emitted")
+
+    assert next(segment_answers(pages())) == "Q1. a"
@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from utils import tracing
+from utils.tracing import span, start_trace
+
+@pytest.fixture
+def trace_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", True)
+    monkeypatch.setattr(tracing, "TRACE_DIR", str(tmp_path))
+    return tmp_path
+
+def test_trace_is_exported_with_nested_spans(trace_dir):
+    with start_trace("evaluate") as trace:
+        with span("match", answer_chars=12):
+            pass
+    events = [event["name"] for event in trace.to_chrome()["traceEvents"] if event["ph"] == "X"]
+    assert sorted(events) == ["evaluate", "match"]
+    assert os.listdir(trace_dir) == [f"{trace.trace_id}.json"]
+
+def test_trace_dir_keeps_only_the_newest(trace_dir, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_MAX_FILES", 3)
+    trace_ids = []
+    for i in range(5):
+        with start_trace("evaluate") as trace:
+            trace_ids.append(trace.trace_id)
+        # Distinct mtimes regardless of timestamp resolution
+        os.utime(trace_dir / f"{trace.trace_id}.json", (i, i))
+    assert sorted(os.listdir(trace_dir)) == sorted(f"{trace_id}.json" for trace_id in trace_ids[2:])
+
+def test_disabled_tracing_writes_nothing(monkeypatch, tmp_path):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+    monkeypatch.setattr(tracing, "TRACE_DIR", str(tmp_path))
+    with start_trace("evaluate") as trace:
+        assert trace is None
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,36 @@
+import pytest
+
+from utils.units import find_quantities, final_quantity, parse_unit, quantities_equal
+
+def _q(text):
+    return final_quantity(text)
+
+@pytest.mark.parametrize("a, b", [
+    ("72 km/h", "20 m/s"),
+    ("4 N", "4.0 N"),
+    ("1.5 kJ", "1500 J"),
+    ("3 x 10^8 m/s", "3e8 m/s"),
+    ("250 mA", "0.25 A"),
+    ("9.8 m/s^2", "980 cm/s^2"),
+])
+def test_equal_after_unit_conversion(a, b):
+    assert quantities_equal(_q(a), _q(b)) is True
+
+def test_different_values_are_not_equal():
+    assert quantities_equal(_q("5 N"), _q("4 N")) is False
+
+def test_incompatible_units_cannot_be_compared():
+    assert quantities_equal(_q("5 N"), _q("5 m")) is None
+
+def test_case_sensitive_prefixes():
+    assert parse_unit("mW")[0] == pytest.approx(1e-3)
+    assert parse_unit("MW")[0] == pytest.approx(1e6)
+
+def test_unknown_unit():
+    assert parse_unit("furlong") is None
+    assert find_quantities("3 furlongs")[0]["dims"] is None
+
+def test_find_quantities_in_order():
+    values = [q["value"] for q in find_quantities("v = d/t = 100 m / 5 s = 20 m/s")]
+    assert values == [100, 5, 20]
+    assert final_quantity("no numbers") is None
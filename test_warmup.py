@@ -0,0 +1,43 @@
+import datetime
+
+import pytest
+
+from utils.warmup import in_window, parse_windows
+
+MONDAY = datetime.date(2024, 1, 1)
+
+def _at(day_offset, hour, minute=0):
+    return datetime.datetime.combine(MONDAY + datetime.timedelta(days=day_offset), datetime.time(hour, minute))
+
+def test_parse_windows():
+    assert parse_windows("Mon-Fri 08:00-18:00; Sat 09:30-13:00") == [
+        ({0, 1, 2, 3, 4}, 480, 1080), ({5}, 570, 780)]
+    # Day ranges wrap around the week
+    assert parse_windows("Sat-Mon 09:00-10:00") == [({5, 6, 0}, 540, 600)]
+    assert parse_windows("") == []
+
+@pytest.mark.parametrize("spec", ["Mon", "Mon 8-9", "Someday 08:00-09:00", "Mon 08:00-08:00", "Mon 25:00-26:00"])
+def test_malformed_windows_are_rejected(spec):
+    with pytest.raises(ValueError):
+        parse_windows(spec)
+
+@pytest.mark.parametrize("now, expected", [
+    (_at(0, 8), True),          # Monday, start is inclusive
+    (_at(0, 17, 59), True),
+    (_at(0, 18), False),        # end is exclusive
+    (_at(5, 12), False),        # Saturday
+    (_at(6, 12), False),
+])
+def test_in_window(now, expected):
+    assert in_window(parse_windows("Mon-Fri 08:00-18:00"), now) is expected
+
+@pytest.mark.parametrize("now, expected", [
+    (_at(0, 23), True),         # Monday night
+    (_at(1, 1, 59), True),      # early Tuesday, still Monday's window
+    (_at(1, 2), False),
+    (_at(0, 1), False),         # early Monday follows Sunday, which is not listed
+    (_at(5, 1), True),          # early Saturday, Friday's window
+    (_at(5, 23), False),
+])
+def test_window_past_midnight(now, expected):
+    assert in_window(parse_windows("Mon-Fri 22:00-02:00"), now) is expected
@@ -0,0 +1,235 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import defaultdict, deque
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+# off: talk to the endpoints. record: talk to them and log every exchange.
+# replay: serve logged exchanges without any network access.
+CASSETTE_MODE = os.getenv("INFERENCE_CASSETTE_MODE", "off")
+CASSETTE_PATH = os.getenv("INFERENCE_CASSETTE", os.path.join("cassettes", "inference.jsonl.gz"))
+# original: reproduce recorded latencies and stream pacing. fast: no waiting.
+REPLAY_TIMING = os.getenv("INFERENCE_REPLAY_TIMING", "original")
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """A replayed request that was never recorded; handled like a network failure."""
+
+def request_key(model_url, body):
+    """Identifies a request by endpoint and serialised payload. Payloads are not stored."""
+    return hashlib.sha256(f"{model_url}\n{body}".encode("utf-8")).hexdigest()[:32]
+
+def _open(path, mode):
+    # ".gz" logs are a series of gzip members, one per entry, so appends stay cheap
+    return gzip.open(path, mode + "t", encoding="utf-8") if path.endswith(".gz") else open(path, mode, encoding="utf-8")
+
+def _bytes_to_text(data):
+    # latin-1 maps every byte to one character: lossless even when a chunk splits a UTF-8 sequence
+    return data.decode("latin-1")
+
+def _text_to_bytes(text):
+    return text.encode("latin-1")
+
+def _is_model_loading(status, body):
+    # Cold-start 503s reflect the model's state at recording time, not the
+    # request; replay serves the answer that followed instead
+    return status == 503 and (b"loading" in body.lower() or b"estimated_time" in body)
+
+class Recorder:
+    """Appends one JSON line per inference exchange to a cassette file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def write(self, entry):
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock, _open(self.path, "a") as f:
+            f.write(line)
+
+class _TeeRaw:
+    """
+    Wraps a streamed response's urllib3 body: chunks pass through to the caller
+    and are logged with their arrival offset. The entry is written when the
+    response is closed, whether the stream was read to the end or cut short.
+    """
+
+    def __init__(self, raw, entry, started, recorder):
+        self._raw = raw
+        self._entry = entry
+        self._started = started
+        self._recorder = recorder
+        self._done = False
+
+    def stream(self, amt=None, decode_content=None):
+        for chunk in self._raw.stream(amt, decode_content=decode_content):
+            self._entry["chunks"].append([round(time.monotonic() - self._started, 4), _bytes_to_text(chunk)])
+            yield chunk
+        # Read to the end of the body (False when the caller stopped early)
+        self._entry["complete"] = True
+
+    def _finish(self):
+        if not self._done:
+            self._done = True
+            self._entry["duration_s"] = round(time.monotonic() - self._started, 4)
+            body = b"".join(_text_to_bytes(text) for _, text in self._entry["chunks"])
+            if not _is_model_loading(self._entry["status"], body):
+                self._recorder.write(self._entry)
+
+    def close(self):
+        self._finish()
+        self._raw.close()
+
+    def release_conn(self):
+        self._finish()
+        release_conn = getattr(self._raw, "release_conn", None)
+        if release_conn is not None:
+            release_conn()
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+class _ReplayRaw:
+    """File-like body that hands out recorded chunks, paced like the original stream."""
+
+    def __init__(self, chunks, started, timing):
+        self._chunks = deque(chunks)
+        self._started = started
+        self._timing = timing
+
+    def read(self, amt=None):
+        if not self._chunks:
+            return b""
+        offset, text = self._chunks.popleft()
+        if self._timing == "original":
+            delay = offset - (time.monotonic() - self._started)
+            if delay > 0:
+                time.sleep(delay)
+        return _text_to_bytes(text)
+
+    def close(self):
+        self._chunks.clear()
+
+class Player:
+    """
+    Serves recorded exchanges by request key. A request recorded several times
+    gets its recordings in order, then the last one again.
+    """
+
+    def __init__(self, path, timing=None):
+        self.path = path
+        self.timing = timing or REPLAY_TIMING
+        self._entries = defaultdict(deque)
+        self._lock = threading.Lock()
+        for entry in load_entries(path):
+            self._entries[entry["key"]].append(entry)
+        logger.info(f"Replaying {sum(map(len, self._entries.values()))} recorded inference calls from {path}")
+
+    def _next(self, key, model_url):
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMiss(f"No recorded response for this request to {model_url} (key {key})")
+            return entries.popleft() if len(entries) > 1 else entries[0]
+
+    def response(self, model_url, body, stream=False):
+        """Builds a `requests.Response` from the recording, sleeping first under original timing."""
+        entry = self._next(request_key(model_url, body), model_url)
+        started = time.monotonic()
+        if self.timing == "original":
+            time.sleep(entry["latency_s"])
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = entry.get("encoding")
+        response.url = model_url
+        if "chunks" in entry:
+            response.raw = _ReplayRaw(entry["chunks"], started, self.timing)
+        else:
+            response._content = _text_to_bytes(entry["body"])
+            response._content_consumed = True
+        return response
+
+def load_entries(path):
+    """Reads every entry of a cassette file; a truncated last line is skipped."""
+    entries = []
+    with _open(path, "r") as f:
+        try:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Skipping unreadable cassette line in {path}")
+        except EOFError:
+            # Interrupted while writing the last gzip member
+            logger.warning(f"Cassette {path} ends mid-entry; using {len(entries)} entries")
+    return entries
+
+_recorder = None
+_player = None
+_init_lock = threading.Lock()
+
+def _get_recorder():
+    global _recorder
+    with _init_lock:
+        if _recorder is None or _recorder.path != CASSETTE_PATH:
+            _recorder = Recorder(CASSETTE_PATH)
+        return _recorder
+
+def _get_player():
+    global _player
+    with _init_lock:
+        if _player is None or _player.path != CASSETTE_PATH or _player.timing != REPLAY_TIMING:
+            _player = Player(CASSETTE_PATH, REPLAY_TIMING)
+        return _player
+
+def replaying():
+    return CASSETTE_MODE == "replay"
+
+def send(model_url, headers, body, stream=False, priority=None):
+    """
+    Transport for `utils.hf_client`: a plain `requests.post` unless a cassette
+    mode is set (INFERENCE_CASSETTE_MODE).
+    Args:
+        priority (tuple): (priority class, tenant), logged with recordings.
+    """
+    if CASSETTE_MODE == "replay":
+        return _get_player().response(model_url, body, stream)
+    if CASSETTE_MODE != "record":
+        return requests.post(model_url, headers=headers, data=body, stream=stream)
+
+    started_at = time.time()
+    started = time.monotonic()
+    response = requests.post(model_url, headers=headers, data=body, stream=stream)
+    entry = {
+        "key": request_key(model_url, body),
+        "model_url": model_url,
+        "started_at": round(started_at, 4),
+        "latency_s": round(time.monotonic() - started, 4),
+        "status": response.status_code,
+        # Bodies are logged decoded, so only the content type is kept
+        "headers": {"Content-Type": response.headers.get("Content-Type", "")},
+        "encoding": response.encoding,
+        "stream": stream,
+        "payload_bytes": len(body),
+    }
+    if priority:
+        entry["priority"], entry["tenant"] = priority
+    if stream:
+        entry.update(chunks=[], complete=False)
+        response.raw = _TeeRaw(response.raw, entry, started, _get_recorder())
+    else:
+        entry["body"] = _bytes_to_text(response.content)
+        entry["duration_s"] = round(time.monotonic() - started, 4)
+        if not _is_model_loading(response.status_code, response.content):
+            _get_recorder().write(entry)
+    return response
@@ -0,0 +1,18 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+_loaded = False
+
+def load_env():
+    """
+    Loads `.env` into the environment once per process. Entry points call it
+    before importing the agents, whose settings are read at import time; later
+    calls are no-ops.
+    """
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    from dotenv import load_dotenv
+    load_dotenv()
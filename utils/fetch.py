@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("FETCH_CACHE_DIR", os.path.join(tempfile.gettempdir(), "answer-sheet-cache"))
+MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(20 * 1024 * 1024)))
+# Least recently used files are evicted beyond this total size or once unused this long
+CACHE_MAX_BYTES = int(os.getenv("FETCH_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+CACHE_MAX_AGE_S = float(os.getenv("FETCH_CACHE_MAX_AGE_S", str(7 * 24 * 3600)))
+CONNECT_TIMEOUT_S = float(os.getenv("FETCH_CONNECT_TIMEOUT_S", "5"))
+READ_TIMEOUT_S = float(os.getenv("FETCH_READ_TIMEOUT_S", "30"))
+ALLOWED_CONTENT_TYPES = ("image/",)
+CHUNK_SIZE = 64 * 1024
+
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=2))
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=2))
+
+class FetchError(Exception):
+    """Raised when a remote file is too large, of the wrong type, or unreachable."""
+
+def _cache_paths(url):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, key), os.path.join(CACHE_DIR, key + ".json")
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _evict(keep):
+    """
+    Trims the cache to CACHE_MAX_BYTES and CACHE_MAX_AGE_S, never removing `keep`.
+    Also removes ".part" files of interrupted downloads: one not written to for
+    longer than the read timeout belongs to no live download.
+    """
+    entries = []
+    now = time.time()
+    for entry in os.scandir(CACHE_DIR):
+        if not entry.is_file() or entry.path == keep:
+            continue
+        stat = entry.stat()
+        if entry.name.endswith(".part"):
+            if now - stat.st_mtime > READ_TIMEOUT_S:
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+        elif "." not in entry.name:
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries) + os.path.getsize(keep)
+    for mtime, size, path in sorted(entries):
+        if total <= CACHE_MAX_BYTES and now - mtime <= CACHE_MAX_AGE_S:
+            continue
+        for stale in (path, path + ".json"):
+            try:
+                os.unlink(stale)
+            except FileNotFoundError:
+                pass
+        total -= size
+
+def fetch_url(url, max_bytes=MAX_BYTES, allowed_types=ALLOWED_CONTENT_TYPES):
+    """
+    Downloads a remote answer sheet image with bounded memory and time.
+    Uses a pooled session, connect/read timeouts, a streamed byte limit and a
+    content-type check. Downloads are cached on disk and revalidated with
+    ETag / Last-Modified, so an unchanged file is not downloaded again; the cache
+    is kept under FETCH_CACHE_MAX_BYTES and FETCH_CACHE_MAX_AGE_S.
+    Args:
+        url (str): http(s) URL of an image.
+        max_bytes (int): Abort once the body exceeds this size.
+        allowed_types (tuple): Accepted Content-Type prefixes.
+    Returns:
+        str: Local path of the cached file.
+    Raises:
+        FetchError: On oversize bodies, disallowed content types or HTTP errors.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    data_path, meta_path = _cache_paths(url)
+    meta = _read_meta(meta_path) if os.path.exists(data_path) else None
+
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        response = _session.get(url, headers=headers, stream=True,
+                                timeout=(CONNECT_TIMEOUT_S, READ_TIMEOUT_S))
+    except requests.exceptions.RequestException as e:
+        raise FetchError(f"Could not fetch {url}: {e}") from e
+
+    with response:
+        if response.status_code == 304 and meta:
+            logger.info(f"Cache hit (not modified): {url}")
+            # mtime records the last use, for eviction
+            os.utime(data_path)
+            return data_path
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            raise FetchError(str(e)) from e
+
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if not content_type.startswith(tuple(allowed_types)):
+            raise FetchError(f"Unsupported content type '{content_type}' for {url}")
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise FetchError(f"{url} is {declared} bytes, limit is {max_bytes}")
+
+        # Stream into a temp file next to the cache entry, then swap it in
+        fd, partial_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".part")
+        try:
+            received = 0
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    received += len(chunk)
+                    if received > max_bytes:
+                        raise FetchError(f"{url} exceeds the {max_bytes} byte limit")
+                    f.write(chunk)
+            os.replace(partial_path, data_path)
+        except BaseException:
+            os.unlink(partial_path)
+            raise
+
+        with open(meta_path, "w") as f:
+            json.dump({
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "content_type": content_type,
+                "size": received,
+            }, f)
+
+    _evict(keep=data_path)
+    logger.info(f"Fetched {received} bytes from {url}")
+    return data_path
@@ -1,24 +1,101 @@
 import os
+import json
+import time
 import requests
 import logging
-from dotenv import load_dotenv
+from contextlib import closing
+from utils.tracing import span
+from utils.scheduler import scheduler
+from utils import cassette
+from utils.env import load_env
 
-load_dotenv()
+load_env()
 
 logger = logging.getLogger(__name__)
 
 HF_TOKEN = os.getenv("HF_TOKEN")
-HEADERS = {"Authorization": f"Bearer {HF_TOKEN}"}
+HEADERS = {"Authorization": f"Bearer {HF_TOKEN}", "Content-Type": "application/json"}
+
+# Cold models answer 503 {"error": "... is currently loading", "estimated_time": 20.0};
+# wait for them up to this long in total instead of failing
+MODEL_LOADING_MAX_WAIT_S = float(os.getenv("MODEL_LOADING_MAX_WAIT_S", "180"))
+MODEL_LOADING_MIN_WAIT_S = 1.0
+
+def loading_estimate(response):
+    """
+    Returns the server's estimated seconds until the model is loaded if
+    `response` is a "model loading" 503, otherwise None.
+    """
+    if response.status_code != 503:
+        return None
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    if not isinstance(body, dict):
+        return None
+    if "loading" not in str(body.get("error", "")).lower() and "estimated_time" not in body:
+        return None
+    try:
+        return float(body.get("estimated_time") or 10.0)
+    except (TypeError, ValueError):
+        return 10.0
+
+def _post(model_url, body, stream=False):
+    """
+    POSTs a serialised payload through the inference scheduler, waiting out
+    "model loading" responses for up to MODEL_LOADING_MAX_WAIT_S (without
+    holding a scheduler slot while waiting). Each HTTP attempt is its own trace span.
+    Returns:
+        tuple: (last response, its scheduler Slot). The caller checks the
+               status and releases the slot once the body has been read.
+    """
+    deadline = time.monotonic() + MODEL_LOADING_MAX_WAIT_S
+    attempt = 0
+    while True:
+        attempt += 1
+        with span("inference", model_url=model_url, payload_bytes=len(body),
+                  attempt=attempt, stream=stream) as attrs:
+            slot = scheduler.acquire()
+            attrs.update(priority=slot.priority_class, tenant=slot.tenant, queue_wait_s=round(slot.wait_s, 4))
+            try:
+                # Plain requests.post unless recording or replaying (utils/cassette.py)
+                response = cassette.send(model_url, HEADERS, body, stream=stream,
+                                         priority=(slot.priority_class, slot.tenant))
+            except Exception:
+                slot.release()
+                raise
+            attrs["status"] = response.status_code
+            estimate = loading_estimate(response)
+            if estimate is None:
+                if not stream:
+                    attrs["response_bytes"] = len(response.content)
+                return response, slot
+            attrs["model_loading_eta_s"] = estimate
+            wait = min(max(estimate, MODEL_LOADING_MIN_WAIT_S), deadline - time.monotonic())
+            if wait <= 0:
+                # Returned like any other response: the caller still holds, and releases, the slot
+                logger.error(f"Model still loading after {MODEL_LOADING_MAX_WAIT_S}s: {model_url}")
+                return response, slot
+            slot.release()
+
+        logger.warning(f"Model loading ({model_url}), retrying in {wait:.1f}s")
+        response.close()
+        with span("model_loading_wait", model_url=model_url, seconds=round(wait, 2)):
+            time.sleep(wait)
 
 def query_hf_inference(payload, model_url):
     """
     Sends a request to the Hugging Face Inference API.
     """
-    if not HF_TOKEN:
+    if not HF_TOKEN and not cassette.replaying():
          raise ValueError("HF_TOKEN environment variable is not set.")
 
+    # Serialise once: the body size is recorded on the trace span for free
+    body = json.dumps(payload)
     try:
-        response = requests.post(model_url, headers=HEADERS, json=payload)
+        response, slot = _post(model_url, body)
+        slot.release()
         response.raise_for_status()
         return response.json()
     except requests.exceptions.HTTPError as e:
@@ -32,3 +109,144 @@ def query_hf_inference(payload, model_url):
     except Exception as e:
         logger.error(f"Request failed: {e}")
         raise
+
+def extract_content(result):
+    """
+    Pulls the generated text out of a (non-streamed) inference response.
+    Handles both the HF `generated_text` list and the chat `choices` format.
+    """
+    if isinstance(result, list) and result and 'generated_text' in result[0]:
+        return result[0]['generated_text']
+    elif isinstance(result, dict) and 'choices' in result:
+        return result['choices'][0]['message']['content']
+    return str(result)
+
+def _delta_text(chunk):
+    """
+    Returns the text carried by one streamed event (chat `delta` or TGI `token`).
+    """
+    if 'choices' in chunk and chunk['choices']:
+        choice = chunk['choices'][0]
+        delta = choice.get('delta') or choice.get('message') or {}
+        return delta.get('content') or choice.get('text') or ""
+    if 'token' in chunk:
+        if chunk['token'].get('special'):
+            return ""
+        return chunk['token'].get('text') or ""
+    return ""
+
+def stream_hf_inference(payload, model_url):
+    """
+    Streams a chat completion from the Hugging Face Inference API.
+    Yields text deltas as they arrive. Closing the generator early closes the
+    HTTP connection, which stops generation on the server side.
+    Endpoints that ignore `stream` and answer with plain JSON are yielded as one chunk.
+    """
+    if not HF_TOKEN and not cassette.replaying():
+         raise ValueError("HF_TOKEN environment variable is not set.")
+
+    body = json.dumps(dict(payload, stream=True))
+    try:
+        response, slot = _post(model_url, body, stream=True)
+    except Exception as e:
+        logger.error(f"Request failed: {e}")
+        raise
+
+    # The scheduler slot is held until the stream is finished or closed
+    with closing(response):
+        try:
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError as e:
+                logger.error(f"HTTP Error: {e}")
+                try:
+                     logger.error(f"Response content: {response.text}")
+                except:
+                     pass
+                raise
+
+            if "text/event-stream" not in response.headers.get("Content-Type", ""):
+                yield extract_content(response.json())
+                return
+
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                except ValueError:
+                    logger.warning(f"Skipping malformed stream event: {data[:80]}")
+                    continue
+                if 'error' in chunk:
+                    raise RuntimeError(f"Inference stream error: {chunk['error']}")
+                text = _delta_text(chunk)
+                if text:
+                    yield text
+        finally:
+            slot.release()
+
+def first_json_object(text):
+    """
+    Returns the first complete top-level JSON object in `text`, or None if no
+    object has been closed yet. Markdown fences and leading chatter are ignored.
+    """
+    start = text.find("{")
+    while start != -1:
+        depth = 0
+        in_string = False
+        escaped = False
+        for i in range(start, len(text)):
+            ch = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    try:
+                        obj = json.loads(text[start:i + 1])
+                    except ValueError:
+                        break
+                    if isinstance(obj, dict):
+                        return obj
+                    break
+        else:
+            # Object still open, wait for more text
+            return None
+        start = text.find("{", start + 1)
+    return None
+
+def stream_json_object(payload, model_url):
+    """
+    Streams a completion and stops generation as soon as a complete JSON object
+    has been parsed from it.
+    Returns:
+        dict: The parsed object.
+    Raises:
+        ValueError: If the stream ends without a complete JSON object.
+    """
+    content = ""
+    with span("inference.stream", model_url=model_url) as attrs, \
+            closing(stream_hf_inference(payload, model_url)) as chunks:
+        for text in chunks:
+            content += text
+            if "}" not in text:
+                continue
+            obj = first_json_object(content)
+            if obj is not None:
+                attrs.update(response_chars=len(content), stopped_early=True)
+                return obj
+        attrs.update(response_chars=len(content), stopped_early=False)
+
+    raise ValueError(f"No JSON object in model output: {content[:200]!r}")
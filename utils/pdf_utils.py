@@ -2,30 +2,52 @@ import fitz  # PyMuPDF
 from PIL import Image
 import io
 import logging
+from utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
+def _open_pdf(pdf_source):
+    """
+    Opens a PDF from a path, or straight from memory when given bytes.
+    """
+    if isinstance(pdf_source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=bytes(pdf_source), filetype="pdf")
+    return fitz.open(pdf_source)
+
+def iter_pdf_images(pdf_source, zoom_x=2.0, zoom_y=2.0):
+    """
+    Lazily renders PDF pages, one PIL Image at a time.
+    Args:
+        pdf_source (str | bytes): Path to the PDF file, or its raw bytes.
+        zoom_x (float): Horizontal zoom factor for higher resolution.
+        zoom_y (float): Vertical zoom factor.
+    Yields:
+        PIL.Image: One image per page.
+    """
+    doc = _open_pdf(pdf_source)
+    try:
+        mat = fitz.Matrix(zoom_x, zoom_y)
+        for page in doc:
+            with span("rasterize", page=page.number + 1) as attrs:
+                pix = page.get_pixmap(matrix=mat)
+                img_data = pix.tobytes("png")
+                attrs.update(width=pix.width, height=pix.height, png_bytes=len(img_data))
+            yield Image.open(io.BytesIO(img_data))
+    finally:
+        doc.close()
+
 def pdf_to_images(pdf_path, zoom_x=2.0, zoom_y=2.0):
     """
     Converts a PDF file into a list of PIL Images.
     Args:
-        pdf_path (str): Path to the PDF file.
+        pdf_path (str | bytes): Path to the PDF file, or its raw bytes.
         zoom_x (float): Horizontal zoom factor for higher resolution.
         zoom_y (float): Vertical zoom factor.
     Returns:
         list[PIL.Image]: List of images, one per page.
     """
-    images = []
     try:
-        doc = fitz.open(pdf_path)
-        mat = fitz.Matrix(zoom_x, zoom_y)
-        for page in doc:
-            pix = page.get_pixmap(matrix=mat)
-            img_data = pix.tobytes("png")
-            img = Image.open(io.BytesIO(img_data))
-            images.append(img)
-        doc.close()
-        return images
+        return list(iter_pdf_images(pdf_path, zoom_x, zoom_y))
     except Exception as e:
         logger.error(f"Error converting PDF to images: {e}")
         return []
@@ -34,13 +56,13 @@ def extract_pdf_text(pdf_path):
     """
     Extracts text from a digital PDF file.
     Args:
-        pdf_path (str): Path to the PDF file.
+        pdf_path (str | bytes): Path to the PDF file, or its raw bytes.
     Returns:
         str: Extracted text joined by newlines.
     """
     text = ""
     try:
-        doc = fitz.open(pdf_path)
+        doc = _open_pdf(pdf_path)
         for page in doc:
             text += page.get_text() + "\n"
         doc.close()
@@ -0,0 +1,182 @@
+import os
+import time
+import uuid
+import sqlite3
+import logging
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DB = os.getenv("RESULTS_DB", "results.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheets (
+    sheet_id TEXT PRIMARY KEY,
+    exam_id TEXT NOT NULL,
+    label TEXT,
+    created_at REAL NOT NULL,
+    tenant TEXT NOT NULL DEFAULT 'default'
+);
+CREATE INDEX IF NOT EXISTS sheets_exam ON sheets(exam_id);
+
+CREATE TABLE IF NOT EXISTS pages (
+    sheet_id TEXT NOT NULL,
+    page_number INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (sheet_id, page_number)
+);
+
+CREATE TABLE IF NOT EXISTS answers (
+    sheet_id TEXT NOT NULL,
+    segment_index INTEGER NOT NULL,
+    question_number TEXT,
+    question_text TEXT,
+    student_answer TEXT,
+    solution_text TEXT,
+    max_marks REAL,
+    marks_awarded REAL,
+    feedback TEXT,
+    grading_tier TEXT,
+    latency_saved_s REAL,
+    cost_saved REAL,
+    low_confidence INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (sheet_id, segment_index)
+);
+CREATE INDEX IF NOT EXISTS answers_question ON answers(question_number);
+"""
+
+ANSWER_FIELDS = ("question_number", "question_text", "student_answer", "solution_text",
+                 "max_marks", "marks_awarded", "feedback", "grading_tier",
+                 "latency_saved_s", "cost_saved", "low_confidence")
+
+# Columns added after a table was first created: (table, column, definition)
+MIGRATIONS = (
+    ("answers", "low_confidence", "INTEGER NOT NULL DEFAULT 0"),
+    ("sheets", "tenant", "TEXT NOT NULL DEFAULT 'default'"),
+)
+
+def new_exam_id():
+    """
+    Default exam id for a sheet submitted without one. Unique per submission, so
+    two teachers using the same question paper never share an exam.
+    """
+    return uuid.uuid4().hex[:16]
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    for table, column, definition in MIGRATIONS:
+        if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return conn
+
+def save_sheet(exam_id, page_texts, graded_items, label=None, db_path=RESULTS_DB, tenant="default"):
+    """
+    Persists one evaluated sheet: page transcripts, matches and grades.
+    Args:
+        exam_id (str): Groups sheets graded against the same solution key.
+        page_texts (dict[int, str]): Page number -> OCR transcript.
+        graded_items (list[dict]): Items from `agents.orchestrator.evaluate_sheet`.
+        tenant (str): Owner of the sheet; only they can regrade it.
+    Returns:
+        str: The new sheet id.
+    """
+    sheet_id = uuid.uuid4().hex
+    with closing(_connect(db_path)) as conn, conn:
+        conn.execute("INSERT INTO sheets (sheet_id, exam_id, label, created_at, tenant) VALUES (?, ?, ?, ?, ?)",
+                     (sheet_id, exam_id, label, time.time(), tenant))
+        conn.executemany("INSERT INTO pages VALUES (?, ?, ?)",
+                         [(sheet_id, number, text) for number, text in sorted(page_texts.items())])
+        conn.executemany(
+            f"INSERT INTO answers VALUES (?, ?, {', '.join('?' * len(ANSWER_FIELDS))})",
+            [(sheet_id, idx) + tuple(item.get(field) for field in ANSWER_FIELDS[:-1])
+             + (int(bool(item.get("low_confidence"))),)
+             for idx, item in enumerate(graded_items)])
+    return sheet_id
+
+def load_answers(exam_id, db_path=RESULTS_DB, tenant=None):
+    """
+    Returns every stored answer of an exam as dicts (with "sheet_id" and "segment_index").
+    With `tenant`, only answers on sheets that tenant stored.
+    """
+    query = "SELECT a.* FROM answers a JOIN sheets s ON s.sheet_id = a.sheet_id WHERE s.exam_id = ?"
+    params = (exam_id,)
+    if tenant is not None:
+        query += " AND s.tenant = ?"
+        params += (tenant,)
+    with closing(_connect(db_path)) as conn:
+        rows = conn.execute(query, params).fetchall()
+    return [dict(row) for row in rows]
+
+def has_sheets(exam_id, tenant=None, db_path=RESULTS_DB):
+    """True if the exam has stored sheets (with `tenant`, sheets that tenant stored)."""
+    query = "SELECT 1 FROM sheets WHERE exam_id = ?"
+    params = (exam_id,)
+    if tenant is not None:
+        query += " AND tenant = ?"
+        params += (tenant,)
+    with closing(_connect(db_path)) as conn:
+        return conn.execute(query + " LIMIT 1", params).fetchone() is not None
+
+def load_graded_items(sheet_id, db_path=RESULTS_DB):
+    """Returns a sheet's graded items in answer-sheet order, ready for `generate_report`."""
+    with closing(_connect(db_path)) as conn:
+        rows = conn.execute("SELECT * FROM answers WHERE sheet_id = ? ORDER BY segment_index",
+                            (sheet_id,)).fetchall()
+    return [dict(row) for row in rows]
+
+def load_pages(sheet_id, db_path=RESULTS_DB):
+    """Returns a sheet's page transcripts as {page_number: text}."""
+    with closing(_connect(db_path)) as conn:
+        rows = conn.execute("SELECT page_number, text FROM pages WHERE sheet_id = ?", (sheet_id,)).fetchall()
+    return {row["page_number"]: row["text"] for row in rows}
+
+def update_grades(updates, db_path=RESULTS_DB):
+    """
+    Overwrites the grades of specific answers in one transaction.
+    Args:
+        updates (list[dict]): Each with "sheet_id", "segment_index" and the new
+                              solution_text, max_marks, marks_awarded, feedback,
+                              grading_tier, latency_saved_s, cost_saved, low_confidence.
+    """
+    with closing(_connect(db_path)) as conn, conn:
+        conn.executemany(
+            """UPDATE answers SET solution_text = :solution_text, max_marks = :max_marks,
+                   marks_awarded = :marks_awarded, feedback = :feedback, grading_tier = :grading_tier,
+                   latency_saved_s = :latency_saved_s, cost_saved = :cost_saved,
+                   low_confidence = :low_confidence
+               WHERE sheet_id = :sheet_id AND segment_index = :segment_index""",
+            [dict(update, low_confidence=int(bool(update.get("low_confidence")))) for update in updates])
+
+SCORE_BATCH_ROWS = 50000
+
+def load_sheet_ids(exam_id, db_path=RESULTS_DB):
+    """
+    Returns (rowids, sheet_ids) of an exam's sheets, ordered by rowid.
+    The integer rowid is what `iter_score_rows` reports per answer.
+    """
+    with closing(_connect(db_path)) as conn:
+        rows = conn.execute("SELECT rowid, sheet_id FROM sheets WHERE exam_id = ? ORDER BY rowid",
+                            (exam_id,)).fetchall()
+    return [row[0] for row in rows], [row[1] for row in rows]
+
+def iter_score_rows(exam_id, db_path=RESULTS_DB, batch_size=SCORE_BATCH_ROWS):
+    """
+    Streams the bare score columns of an exam's identified answers in batches,
+    as plain tuples: (sheet rowid, question_number, marks_awarded, max_marks).
+    Meant for bulk numeric loading; no per-row dicts are built.
+    """
+    with closing(_connect(db_path)) as conn:
+        conn.row_factory = None
+        cursor = conn.execute(
+            """SELECT s.rowid, a.question_number, COALESCE(a.marks_awarded, 0), COALESCE(a.max_marks, 0)
+               FROM answers a JOIN sheets s ON s.sheet_id = a.sheet_id
+               WHERE s.exam_id = ? AND a.question_number != 'UNIDENTIFIED'""",
+            (exam_id,))
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                return
+            yield batch
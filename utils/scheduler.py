@@ -0,0 +1,218 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITY_CLASSES = (INTERACTIVE, BATCH)
+
+# Inference calls allowed in flight at once across the whole deployment
+INFERENCE_CONCURRENCY = int(os.getenv("INFERENCE_CONCURRENCY", "8"))
+# Slots batch work can never take, so an interactive call never waits behind a full batch
+INTERACTIVE_RESERVED_SLOTS = int(os.getenv("INTERACTIVE_RESERVED_SLOTS", "2"))
+# Queue wait an interactive call should stay under; batch admission backs off while it is exceeded
+INTERACTIVE_TARGET_WAIT_S = float(os.getenv("INTERACTIVE_TARGET_WAIT_S", "1.0"))
+# While any interactive call admitted this recently waited over target, batch gets half its slots
+TARGET_WINDOW_S = 60.0
+WAIT_SAMPLES = 1000
+
+# (priority class, tenant) of the work running in this context
+_current = contextvars.ContextVar("inference_priority", default=(INTERACTIVE, "default"))
+
+@contextmanager
+def priority(priority_class, tenant="default"):
+    """
+    Runs the enclosed work, and every inference call it makes, under a priority
+    class and tenant. Worker threads inherit it through `utils.tracing.bind`.
+    """
+    if priority_class not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown priority class: {priority_class}")
+    token = _current.set((priority_class, tenant or "default"))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+def current_priority():
+    """Returns the (priority class, tenant) of the calling context."""
+    return _current.get()
+
+class Slot:
+    """One admitted inference call. Release exactly once; extra calls are ignored."""
+
+    def __init__(self, scheduler, priority_class, tenant, wait_s):
+        self.scheduler = scheduler
+        self.priority_class = priority_class
+        self.tenant = tenant
+        self.wait_s = wait_s
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.scheduler._release(self)
+
+class _Waiter:
+    def __init__(self, tenant):
+        self.tenant = tenant
+        self.enqueued = time.monotonic()
+        self.admitted = False
+
+class InferenceScheduler:
+    """
+    Admission control in front of the inference endpoints.
+    Interactive calls are always admitted before batch calls; batch calls only
+    use slots beyond INTERACTIVE_RESERVED_SLOTS, and half as many while recent
+    interactive waits are over target. Within a class, the tenant with the fewest calls
+    in flight goes next, ties going to the tenant served least recently (round
+    robin), so one tenant's bulk run cannot crowd out the others.
+    """
+
+    def __init__(self, concurrency=None, reserved=None, target_wait_s=None):
+        self.concurrency = max(1, concurrency or INFERENCE_CONCURRENCY)
+        reserved = INTERACTIVE_RESERVED_SLOTS if reserved is None else reserved
+        self.reserved = min(max(0, reserved), self.concurrency - 1)
+        self.target_wait_s = INTERACTIVE_TARGET_WAIT_S if target_wait_s is None else target_wait_s
+        self._cond = threading.Condition()
+        self._queues = {cls: {} for cls in PRIORITY_CLASSES}      # class -> tenant -> deque[_Waiter]
+        self._running = {cls: {} for cls in PRIORITY_CLASSES}     # class -> tenant -> count
+        self._waits = {cls: deque(maxlen=WAIT_SAMPLES) for cls in PRIORITY_CLASSES}
+        self._served = dict.fromkeys(PRIORITY_CLASSES, 0)
+        # tenant -> admission sequence number of its latest call; dropped once the
+        # tenant has nothing queued or running
+        self._last_admitted = {}
+        self._admissions = 0
+
+    def _in_flight(self, priority_class=None):
+        classes = [priority_class] if priority_class else PRIORITY_CLASSES
+        return sum(sum(self._running[cls].values()) for cls in classes)
+
+    def _interactive_over_target(self):
+        # Interactive calls admitted within the last TARGET_WINDOW_S that waited too long
+        now = time.monotonic()
+        return any(now - at < TARGET_WINDOW_S and wait > self.target_wait_s
+                   for at, wait in self._waits[INTERACTIVE])
+
+    def _batch_limit(self):
+        limit = self.concurrency - self.reserved
+        if self._interactive_over_target():
+            limit = max(1, limit // 2)
+        return limit
+
+    def _capacity(self, priority_class):
+        free = self.concurrency - self._in_flight()
+        if priority_class == INTERACTIVE:
+            return free
+        if any(self._queues[INTERACTIVE].values()):
+            return 0
+        return min(free, self._batch_limit() - self._in_flight(BATCH))
+
+    def _next_waiter(self, priority_class):
+        running = self._running[priority_class]
+        queues = [(running.get(tenant, 0), self._last_admitted.get(tenant, -1), tenant)
+                  for tenant, queue in self._queues[priority_class].items() if queue]
+        if not queues:
+            return None
+        _, _, tenant = min(queues)
+        return self._queues[priority_class][tenant][0]
+
+    def _admit(self):
+        """Marks as admitted every waiter that now fits. Caller holds the lock."""
+        admitted = False
+        for cls in PRIORITY_CLASSES:
+            while self._capacity(cls) > 0:
+                waiter = self._next_waiter(cls)
+                if waiter is None:
+                    break
+                queue = self._queues[cls][waiter.tenant]
+                queue.popleft()
+                if not queue:
+                    del self._queues[cls][waiter.tenant]
+                self._running[cls][waiter.tenant] = self._running[cls].get(waiter.tenant, 0) + 1
+                self._admissions += 1
+                self._last_admitted[waiter.tenant] = self._admissions
+                waiter.admitted = True
+                admitted = True
+        if admitted:
+            self._cond.notify_all()
+
+    def acquire(self, priority_class=None, tenant=None):
+        """
+        Blocks until the call may run. Defaults to the context's priority.
+        Returns:
+            Slot: Release it when the response has been read.
+        """
+        if priority_class is None:
+            priority_class, default_tenant = current_priority()
+            tenant = tenant or default_tenant
+        tenant = tenant or "default"
+        waiter = _Waiter(tenant)
+        with self._cond:
+            self._queues[priority_class].setdefault(tenant, deque()).append(waiter)
+            self._admit()
+            while not waiter.admitted:
+                # Timed so batch waiters notice when the over-target window has passed
+                self._cond.wait(timeout=TARGET_WINDOW_S)
+                self._admit()
+            now = time.monotonic()
+            wait_s = now - waiter.enqueued
+            self._waits[priority_class].append((now, wait_s))
+            self._served[priority_class] += 1
+        return Slot(self, priority_class, tenant, wait_s)
+
+    def _release(self, slot):
+        with self._cond:
+            running = self._running[slot.priority_class]
+            running[slot.tenant] -= 1
+            if not running[slot.tenant]:
+                del running[slot.tenant]
+                if not any(slot.tenant in self._running[cls] or slot.tenant in self._queues[cls]
+                           for cls in PRIORITY_CLASSES):
+                    self._last_admitted.pop(slot.tenant, None)
+            self._admit()
+
+    @contextmanager
+    def slot(self, priority_class=None, tenant=None):
+        """`acquire` / `release` as a context manager."""
+        slot = self.acquire(priority_class, tenant)
+        try:
+            yield slot
+        finally:
+            slot.release()
+
+    def stats(self):
+        """
+        Queue depth, calls in flight and queue wait times per priority class.
+        Returns:
+            dict: class -> {"queued", "running", "served", "tenants_queued",
+                  "wait_mean_s", "wait_p95_s", "wait_max_s"}, plus "concurrency",
+                  "interactive_reserved_slots" and "interactive_target_wait_s".
+        """
+        with self._cond:
+            result = {
+                "concurrency": self.concurrency,
+                "interactive_reserved_slots": self.reserved,
+                "interactive_target_wait_s": self.target_wait_s,
+            }
+            for cls in PRIORITY_CLASSES:
+                waits = sorted(wait for _, wait in self._waits[cls])
+                queues = self._queues[cls]
+                result[cls] = {
+                    "queued": sum(len(queue) for queue in queues.values()),
+                    "running": self._in_flight(cls),
+                    "served": self._served[cls],
+                    "tenants_queued": sorted(tenant for tenant, queue in queues.items() if queue),
+                    "wait_mean_s": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                    "wait_p95_s": round(waits[min(len(waits) - 1, int(0.95 * len(waits)))], 4) if waits else 0.0,
+                    "wait_max_s": round(waits[-1], 4) if waits else 0.0,
+                }
+            result[INTERACTIVE]["within_target"] = result[INTERACTIVE]["wait_p95_s"] <= self.target_wait_s
+        return result
+
+scheduler = InferenceScheduler()
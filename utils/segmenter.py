@@ -0,0 +1,59 @@
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A new answer starts on a line like "Q1.", "Q.2a)", "Question 3(b):" or a bare "Q4".
+# Only an uppercase Q counts, and the number must end in ".", ")", ":", a part
+# label or the line end, so working such as "q1 = 2 uC" or "Q1 = 4 N" does not.
+QUESTION_MARKER = re.compile(
+    r"^[ \t]*(?:Q|Question)[ \t]*\.?[ \t]*\d+"
+    r"(?:[ \t]*\(?[a-z]\)|[a-z]\b(?![ \t]*[=+\-*/^<>])|[ \t]*[.):]|[ \t]*$)",
+    re.MULTILINE,
+)
+PAGE_HEADER = re.compile(r"^\s*--- Page \d+ ---\s*$", re.MULTILINE)
+TRAILING_PAGE_HEADERS = re.compile(r"(?:\s*--- Page \d+ ---)+\s*$")
+
+def _has_content(text):
+    return bool(PAGE_HEADER.sub("", text).strip())
+
+def _split(text):
+    """
+    Splits text at every question marker. Text before the first marker is kept
+    as its own segment if it holds anything besides page headers.
+    """
+    starts = [m.start() for m in QUESTION_MARKER.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    bounds = starts + [len(text)]
+    for begin, end in zip(bounds, bounds[1:]):
+        segment = text[begin:end]
+        if _has_content(segment):
+            # A header right before the next marker belongs to the next answer
+            yield TRAILING_PAGE_HEADERS.sub("", segment).strip()
+
+def segment_answers(page_texts):
+    """
+    Splits a stream of OCR page texts into individual answers.
+    An answer is emitted as soon as the next question marker is seen, so
+    downstream matching can start while later pages are still being transcribed.
+    Answers that continue onto the next page stay together.
+    Args:
+        page_texts (iterable[str]): Page transcripts in page order.
+    Yields:
+        str: One answer segment at a time. A sheet with no markers yields one segment.
+    """
+    pending = ""
+    for page_text in page_texts:
+        pending += page_text
+        markers = [m.start() for m in QUESTION_MARKER.finditer(pending)]
+        if not markers or markers[-1] == 0:
+            continue
+        # Everything before the last marker is complete
+        complete, pending = pending[:markers[-1]], pending[markers[-1]:]
+        for segment in _split(complete):
+            logger.info(f"Segment ready ({len(segment)} chars)")
+            yield segment
+
+    for segment in _split(pending):
+        yield segment
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Off by default: every traced request writes a file
+TRACING_ENABLED = os.getenv("TRACING", "0") not in ("0", "false", "False")
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+# Oldest traces are deleted once the folder holds more than this many
+TRACE_MAX_FILES = int(os.getenv("TRACE_MAX_FILES", "500"))
+
+# (trace, span id) of the innermost open span in this context
+_current = contextvars.ContextVar("current_span", default=None)
+
+class Trace:
+    """Spans recorded for one evaluation, exportable as a Chrome trace."""
+
+    def __init__(self, name):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.origin_ns = time.perf_counter_ns()
+        self.wall_start = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_chrome(self):
+        """
+        Chrome trace-event JSON (chrome://tracing, Perfetto, speedscope).
+        One complete ("X") event per span; threads become timeline rows.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        events = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": tname}}
+                  for tid, tname in sorted({(s["tid"], s["thread"]) for s in spans})]
+        for s in spans:
+            events.append({
+                "name": s["name"],
+                "cat": s["name"].split(".")[0],
+                "ph": "X",
+                "pid": 1,
+                "tid": s["tid"],
+                "ts": (s["start_ns"] - self.origin_ns) / 1000,
+                "dur": s["duration_ns"] / 1000,
+                "args": dict(s["attrs"], span_id=s["span_id"], parent_id=s["parent_id"]),
+            })
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"trace_id": self.trace_id, "name": self.name, "started_at": self.wall_start},
+        }
+
+    def export(self, trace_dir=None):
+        """
+        Writes the trace to <trace_dir>/<trace_id>.json and returns the path.
+        Keeps at most TRACE_MAX_FILES traces, dropping the oldest.
+        """
+        trace_dir = trace_dir or TRACE_DIR
+        os.makedirs(trace_dir, exist_ok=True)
+        path = os.path.join(trace_dir, f"{self.trace_id}.json")
+        with open(path, "w") as f:
+            json.dump(self.to_chrome(), f, default=str)
+        _rotate(trace_dir, keep=path)
+        return path
+
+def _rotate(trace_dir, keep):
+    traces = [entry for entry in os.scandir(trace_dir)
+              if entry.name.endswith(".json") and entry.path != keep]
+    excess = len(traces) + 1 - TRACE_MAX_FILES
+    if excess <= 0:
+        return
+    for entry in sorted(traces, key=lambda entry: entry.stat().st_mtime)[:excess]:
+        try:
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            # Removed by a concurrent export
+            pass
+
+def current_trace_id():
+    """Trace id of the active trace, or None."""
+    active = _current.get()
+    return active[0].trace_id if active else None
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Records a nested span under the active trace. A no-op outside a trace.
+    Yields the span's attribute dict so callers can add results (sizes, status...).
+    Exceptions are recorded as an "error" attribute and re-raised.
+    """
+    active = _current.get()
+    if active is None:
+        yield {}
+        return
+
+    trace, parent_id = active
+    span_id = uuid.uuid4().hex[:16]
+    thread = threading.current_thread()
+    record = {"name": name, "span_id": span_id, "parent_id": parent_id, "attrs": attrs,
+              "tid": thread.ident, "thread": thread.name, "start_ns": time.perf_counter_ns()}
+    token = _current.set((trace, span_id))
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        record["duration_ns"] = time.perf_counter_ns() - record["start_ns"]
+        trace.add(record)
+
+@contextmanager
+def start_trace(name, **attrs):
+    """
+    Starts a request-scoped trace with a root span, and exports it on exit.
+    Yields:
+        Trace | None: The trace (None when tracing is disabled).
+    """
+    if not TRACING_ENABLED:
+        yield None
+        return
+
+    trace = Trace(name)
+    token = _current.set((trace, None))
+    try:
+        with span(name, trace_id=trace.trace_id, **attrs):
+            yield trace
+    finally:
+        _current.reset(token)
+        try:
+            path = trace.export()
+            logger.info(f"Trace {trace.trace_id} written to {path} ({len(trace.spans)} spans)")
+        except OSError as e:
+            logger.error(f"Could not export trace {trace.trace_id}: {e}")
+
+def bind(fn):
+    """
+    Binds `fn` to a copy of the current context so spans opened on another
+    thread nest under the caller's span. Bind once per thread/task submission.
+    """
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
@@ -0,0 +1,136 @@
+import re
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Dimension vectors: (length, mass, time, current, temperature, amount)
+_L = (1, 0, 0, 0, 0, 0)
+_M = (0, 1, 0, 0, 0, 0)
+_T = (0, 0, 1, 0, 0, 0)
+_I = (0, 0, 0, 1, 0, 0)
+_K = (0, 0, 0, 0, 1, 0)
+_N = (0, 0, 0, 0, 0, 1)
+_NONE = (0, 0, 0, 0, 0, 0)
+
+def _dims(*parts):
+    """Sums (dimension, power) pairs into one dimension vector."""
+    total = [0] * 6
+    for dim, power in parts:
+        for i, d in enumerate(dim):
+            total[i] += d * power
+    return tuple(total)
+
+_FORCE = _dims((_M, 1), (_L, 1), (_T, -2))
+_ENERGY = _dims((_FORCE, 1), (_L, 1))
+_POWER = _dims((_ENERGY, 1), (_T, -1))
+_PRESSURE = _dims((_FORCE, 1), (_L, -2))
+_CHARGE = _dims((_I, 1), (_T, 1))
+_VOLTAGE = _dims((_POWER, 1), (_I, -1))
+
+# symbol -> (factor to SI, dimension vector)
+UNITS = {
+    "m": (1.0, _L), "km": (1e3, _L), "cm": (1e-2, _L), "mm": (1e-3, _L),
+    "um": (1e-6, _L), "µm": (1e-6, _L), "μm": (1e-6, _L), "nm": (1e-9, _L),
+    "kg": (1.0, _M), "g": (1e-3, _M), "mg": (1e-6, _M),
+    "s": (1.0, _T), "sec": (1.0, _T), "ms": (1e-3, _T), "min": (60.0, _T),
+    "h": (3600.0, _T), "hr": (3600.0, _T),
+    "a": (1.0, _I), "ma": (1e-3, _I),
+    "k": (1.0, _K), "mol": (1.0, _N),
+    "l": (1e-3, _dims((_L, 3))), "ml": (1e-6, _dims((_L, 3))),
+    "hz": (1.0, _dims((_T, -1))), "khz": (1e3, _dims((_T, -1))),
+    "n": (1.0, _FORCE), "kn": (1e3, _FORCE),
+    "j": (1.0, _ENERGY), "kj": (1e3, _ENERGY), "mj": (1e6, _ENERGY),
+    "w": (1.0, _POWER), "kw": (1e3, _POWER), "mw": (1e6, _POWER),
+    "pa": (1.0, _PRESSURE), "kpa": (1e3, _PRESSURE), "mpa": (1e6, _PRESSURE),
+    "c": (1.0, _CHARGE), "v": (1.0, _VOLTAGE), "kv": (1e3, _VOLTAGE),
+    "ohm": (1.0, _dims((_VOLTAGE, 1), (_I, -1))), "Ω": (1.0, _dims((_VOLTAGE, 1), (_I, -1))),
+    "%": (0.01, _NONE),
+}
+
+# Case matters for a few SI prefixes (mW vs MW, mJ vs MJ, mA vs A ...)
+_CASE_SENSITIVE = {"MW": (1e6, _POWER), "mW": (1e-3, _POWER), "MJ": (1e6, _ENERGY),
+                   "mJ": (1e-3, _ENERGY), "MPa": (1e6, _PRESSURE), "mA": (1e-3, _I),
+                   "Ms": (1e6, _T), "ms": (1e-3, _T)}
+
+QUANTITY = re.compile(
+    r"(?<![\w.])([-+]?\d+(?:\.\d+)?|[-+]?\.\d+)"
+    r"(?:\s*(?:[eE]\s*([-+]?\d+)|[x×*]\s*10\s*\^\s*\(?([-+]?\d+)\)?))?"
+    r"(?:\s*([A-Za-zµμΩ%][A-Za-zµμΩ%0-9/\^\*·\-]*))?"
+)
+_TERM = re.compile(r"^([A-Za-zµμΩ%]+)(?:\^?(-?\d+))?$")
+
+def _lookup(symbol):
+    if symbol in _CASE_SENSITIVE:
+        return _CASE_SENSITIVE[symbol]
+    return UNITS.get(symbol.lower())
+
+def parse_unit(unit_text):
+    """
+    Parses a unit expression such as "m/s", "km/h", "m/s^2" or "kg*m^2".
+    Returns:
+        tuple | None: (factor to SI, dimension vector), or None if any part is unknown.
+    """
+    unit_text = unit_text.strip().rstrip(".,;:")
+    if not unit_text:
+        return 1.0, _NONE
+
+    factor = 1.0
+    dims = [0] * 6
+    for position, part in enumerate(unit_text.split("/")):
+        sign = 1 if position == 0 else -1
+        for term in re.split(r"[\*·]", part):
+            if not term:
+                return None
+            m = _TERM.match(term)
+            if not m:
+                return None
+            unit = _lookup(m.group(1))
+            if unit is None:
+                return None
+            power = int(m.group(2) or 1) * sign
+            factor *= unit[0] ** power
+            for i, d in enumerate(unit[1]):
+                dims[i] += d * power
+    return factor, tuple(dims)
+
+def find_quantities(text):
+    """
+    Finds every number (with optional exponent and unit) in `text`.
+    Returns:
+        list[dict]: {"value", "unit", "si_value", "dims"} in order of appearance.
+                    `dims` is None when the unit is not recognised.
+    """
+    quantities = []
+    for m in QUANTITY.finditer(text):
+        value = float(m.group(1))
+        exponent = m.group(2) or m.group(3)
+        if exponent:
+            value *= 10 ** int(exponent)
+        unit_text = (m.group(4) or "").rstrip(".,;:-")
+        parsed = parse_unit(unit_text)
+        if parsed is None:
+            quantities.append({"value": value, "unit": unit_text, "si_value": value, "dims": None})
+        else:
+            quantities.append({"value": value, "unit": unit_text,
+                               "si_value": value * parsed[0], "dims": parsed[1]})
+    return quantities
+
+def final_quantity(text):
+    """Returns the last quantity in `text` (the "final answer"), or None."""
+    quantities = find_quantities(text)
+    return quantities[-1] if quantities else None
+
+def quantities_equal(a, b, rel_tol=0.01):
+    """
+    Compares two quantities from `find_quantities`, converting units.
+    Returns:
+        bool | None: True/False, or None if the units cannot be compared.
+    """
+    if a["dims"] is None or b["dims"] is None:
+        if a["unit"].lower() != b["unit"].lower():
+            return None
+        return math.isclose(a["value"], b["value"], rel_tol=rel_tol, abs_tol=1e-9)
+    if a["dims"] != b["dims"]:
+        return None
+    return math.isclose(a["si_value"], b["si_value"], rel_tol=rel_tol, abs_tol=1e-9)
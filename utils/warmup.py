@@ -0,0 +1,128 @@
+import os
+import time
+import logging
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# The inference client and the agents are imported on the warm-up thread, so
+# the entry points' lifespan hooks stay cheap
+from utils.scheduler import priority, BATCH
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_ON_START = os.getenv("WARM_UP_ON_START", "1") not in ("0", "false", "False")
+# e.g. "Mon-Fri 08:00-18:00; Sat 09:00-13:00" (server local time). Empty disables the pinger.
+KEEP_WARM_WINDOWS = os.getenv("KEEP_WARM_WINDOWS", "")
+KEEP_WARM_INTERVAL_S = float(os.getenv("KEEP_WARM_INTERVAL_S", "240"))
+
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+PING_PAYLOAD = {"messages": [{"role": "user", "content": "ping"}], "max_tokens": 1}
+
+def configured_model_urls():
+    """
+    Every model URL the agents are configured to call, primary models first.
+    """
+    # Imported here: the agents import utils, not the other way round
+    from agents import ocr_agent, matcher_agent, grading_agent
+
+    urls = [ocr_agent.PRIMARY_MODEL_URL, matcher_agent.MODEL_URL]
+    urls += [grading_agent.TIER_URLS[tier] for tier in grading_agent.CASCADE if tier in grading_agent.TIER_URLS]
+    urls.append(ocr_agent.BACKUP_MODEL_URL)
+    return list(dict.fromkeys(urls))
+
+def _ping(url):
+    from utils.hf_client import query_hf_inference
+
+    started = time.monotonic()
+    try:
+        # Pings never delay real grading work
+        with priority(BATCH, "warm-up"):
+            query_hf_inference(PING_PAYLOAD, url)
+        status = "ready"
+    except Exception as e:
+        status = f"failed: {e}"
+    elapsed = round(time.monotonic() - started, 2)
+    logger.info(f"Warm-up {url}: {status} ({elapsed}s)")
+    return {"status": status, "seconds": elapsed}
+
+def warm_up(urls=None):
+    """
+    Sends a one-token request to each model so cold ones start loading.
+    `query_hf_inference` waits out "model loading" responses, so this returns
+    once every model has answered or its loading wait ran out.
+    Returns:
+        dict: url -> {"status", "seconds"}.
+    """
+    urls = urls or configured_model_urls()
+    with ThreadPoolExecutor(max_workers=len(urls) or 1) as pool:
+        return dict(zip(urls, pool.map(_ping, urls)))
+
+def start_warm_up(urls=None):
+    """Runs `warm_up` on a daemon thread so startup is not blocked."""
+    thread = threading.Thread(target=warm_up, args=(urls,), name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def parse_windows(spec):
+    """
+    Parses "Mon-Fri 08:00-18:00; Sat 09:00-13:00" into
+    [(set of weekday numbers, start minute, end minute), ...]. A window ending
+    before it starts ("Mon-Fri 22:00-02:00") runs past midnight into the next day.
+    Raises:
+        ValueError: On a malformed or empty window.
+    """
+    windows = []
+    for part in filter(None, (p.strip() for p in spec.split(";"))):
+        days_spec, hours_spec = part.split()
+        first, _, last = days_spec.lower().partition("-")
+        start_day, end_day = DAYS.index(first[:3]), DAYS.index((last or first)[:3])
+        days = {d % 7 for d in range(start_day, start_day + (end_day - start_day) % 7 + 1)}
+        start, end = (int(h) * 60 + int(m) for h, m in (t.split(":") for t in hours_spec.split("-")))
+        if not (0 <= start < 24 * 60 and 0 <= end <= 24 * 60) or start == end:
+            raise ValueError(f"Invalid keep-warm hours: {hours_spec}")
+        windows.append((days, start, end))
+    return windows
+
+def in_window(windows, now=None):
+    """True if `now` (default: local time) falls inside any window."""
+    now = now or datetime.datetime.now()
+    minute, day = now.hour * 60 + now.minute, now.weekday()
+    for days, start, end in windows:
+        if start < end:
+            if day in days and start <= minute < end:
+                return True
+        # Past midnight: the evening part, or the morning after a listed day
+        elif (day in days and minute >= start) or ((day - 1) % 7 in days and minute < end):
+            return True
+    return False
+
+def start_keep_warm(spec=None, interval_s=None, urls=None):
+    """
+    Starts a daemon thread that pings the models every `interval_s` seconds
+    while inside the configured exam-grading windows (KEEP_WARM_WINDOWS).
+    Returns:
+        threading.Event | None: Set it to stop the pinger; None if no windows are configured.
+    """
+    spec = KEEP_WARM_WINDOWS if spec is None else spec
+    interval_s = interval_s or KEEP_WARM_INTERVAL_S
+    if not spec.strip():
+        return None
+    windows = parse_windows(spec)
+    stop = threading.Event()
+
+    def run():
+        while not stop.is_set():
+            if in_window(windows):
+                warm_up(urls)
+            stop.wait(interval_s)
+
+    threading.Thread(target=run, name="model-keep-warm", daemon=True).start()
+    logger.info(f"Keep-warm pinger active for: {spec} (every {interval_s:.0f}s)")
+    return stop
+
+def start_background_warming():
+    """Startup hook for the API and MCP server: warm-up plus optional keep-warm pinger."""
+    if WARM_UP_ON_START:
+        start_warm_up()
+    return start_keep_warm()